@@ -19,6 +19,9 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 IN THE SOFTWARE.
 """
 from __future__ import unicode_literals
+from array import array
+import heapq
+import locale
 import wx
 import wx.lib.mixins.listctrl as listmix
 from ... import util
@@ -26,12 +29,84 @@ from ... import util
 MINIMUM_COL_SIZE = 100
 COLUMN_SAMPLE_SIZE = 100
 USE_SAMPLE_SIZE = True
+# Longest texts of each column that are measured to size it
+COLUMN_MEASURE_SIZE = 5
+
+# Column types for `ColumnData`
+INT_COLUMN = str('q' if util.PY3 else 'l')
+FLOAT_COLUMN = str('d')
+OBJECT_COLUMN = None
+
+
+def sort_key(value):
+    """Get the key a value is sorted by, comparing strings by the current locale."""
+
+    return locale.strxfrm(value) if util.PY3 and isinstance(value, util.ustr) else value
+
+
+class ColumnData(object):
+    """
+    List rows stored as one array per column and addressed by integer row id.
+
+    Columns with a type are kept in typed arrays, other columns in plain lists.
+    If no types are given, every column is a list and the column count is taken
+    from the first row. Indexing returns a row as a tuple.
+    """
+
+    def __init__(self, types=None):
+        """Initialize."""
+
+        self.types = types
+        self.clear()
+
+    def clear(self):
+        """Remove all rows."""
+
+        if self.types is None:
+            self.columns = None
+        else:
+            self.columns = [array(t) if t is not OBJECT_COLUMN else [] for t in self.types]
+
+    def append(self, values):
+        """Add a row and return its row id."""
+
+        if self.columns is None:
+            self.columns = [[] for v in values]
+        for column, value in zip(self.columns, values):
+            column.append(value)
+        return len(self.columns[0]) - 1
+
+    def get(self, row, col):
+        """Get the value at the given row and column."""
+
+        return self.columns[col][row]
+
+    def increment(self, row, col, amount=1):
+        """Add to the number at the given row and column."""
+
+        self.columns[col][row] += amount
+
+    def values(self):
+        """Iterate the rows as tuples."""
+
+        for row in range(len(self)):
+            yield self[row]
+
+    def __getitem__(self, row):
+        """Get the row as a tuple."""
+
+        return tuple(column[row] for column in self.columns)
+
+    def __len__(self):
+        """Get the row count."""
+
+        return len(self.columns[0]) if self.columns else 0
 
 
 class DynamicList(wx.ListCtrl, listmix.ColumnSorterMixin):
     """Dynamic list."""
 
-    def __init__(self, parent, columns, single_sel=True):
+    def __init__(self, parent, columns, single_sel=True, column_types=None):
         """Init the base class DynamicList object."""
 
         flags = wx.LC_REPORT | wx.LC_VIRTUAL
@@ -46,15 +121,11 @@ class DynamicList(wx.ListCtrl, listmix.ColumnSorterMixin):
         self.sort_init = True
         self.column_count = len(columns)
         self.headers = columns
-        self.itemDataMap = {}
+        self.itemDataMap = ColumnData(column_types)
         self.first_resize = True
-        self.size_sample = COLUMN_SAMPLE_SIZE
-        self.widest_cell = [MINIMUM_COL_SIZE] * self.column_count
         self.attr1 = wx.ListItemAttr()
         self.attr1.SetBackgroundColour(wx.Colour(0xEE, 0xEE, 0xEE))
-        self.dc = wx.ClientDC(self)
-        self.dc.SetFont(self.GetFont())
-        self.last_idx_sized = -1
+        self.sort_cache = {}
         self.create_image_list()
 
     def resize_last_column(self):
@@ -69,48 +140,56 @@ class DynamicList(wx.ListCtrl, listmix.ColumnSorterMixin):
         if total_width < self.GetSize()[0] - 20:
             self.SetColumnWidth(self.column_count - 1, last_width + self.GetSize()[0] - total_width)
 
+    def get_column_widths(self):
+        """
+        Estimate the width of each column.
+
+        The first "COLUMN_SAMPLE_SIZE" rows (or all rows if "USE_SAMPLE_SIZE" is off)
+        are sampled, and only the longest texts of each column are measured.
+        """
+
+        rows = len(self.itemDataMap)
+        if USE_SAMPLE_SIZE:
+            rows = min(rows, COLUMN_SAMPLE_SIZE)
+        dc = wx.ClientDC(self)
+        dc.SetFont(self.GetFont())
+        widths = []
+        for x in range(0, self.column_count):
+            texts = heapq.nlargest(
+                COLUMN_MEASURE_SIZE, (self.get_item_text(idx, x, True) for idx in range(rows)), key=len
+            )
+            widths.append(max([MINIMUM_COL_SIZE] + [dc.GetFullTextExtent(text)[0] + 30 for text in texts]))
+        return widths
+
     def init_column_size(self):
         """Setup the initial column size."""
 
-        for i in range(0, self.column_count):
-            self.SetColumnWidth(i, self.widest_cell[i])
+        for i, width in enumerate(self.get_column_widths()):
+            self.SetColumnWidth(i, width)
         self.resize_last_column()
-        self.size_sample = 0
 
     def get_column_count(self):
         """Get column count."""
 
         return self.column_count
 
-    def set_item_map(self, idx, *args):
-        """Set new entry in item map."""
-
-        self.itemDataMap[idx] = tuple([a for a in args])
-        # Sample the first "size_sample" to determine
-        # column width for when table first loads
-        if self.size_sample or not USE_SAMPLE_SIZE:
-            for x in range(0, self.column_count):
-                text = self.get_item_text(idx, x, True)
-                lw = self.dc.GetFullTextExtent(text)[0]
-                width = lw + 30
-                if width > self.widest_cell[x]:
-                    self.widest_cell[x] = width
-            self.last_idx_sized = idx
-            self.size_sample -= 1
+    def set_item_map(self, *args):
+        """Add a new entry to the item map and return its row id."""
+
+        return self.itemDataMap.append(args)
 
     def get_map_item(self, idx, col=0, absolute=False):
         """Get attribute in in item map entry and the given index."""
 
-        return self.itemDataMap[self.itemIndexMap[idx] if not absolute else idx][col]
+        return self.itemDataMap.get(self.itemIndexMap[idx] if not absolute else idx, col)
 
     def reset_list(self):
         """Reset the list."""
 
         self.ClearAll()
-        self.itemDataMap = {}
+        self.itemDataMap.clear()
+        self.sort_cache = {}
         self.SetItemCount(0)
-        self.size_sample = COLUMN_SAMPLE_SIZE
-        self.widest_cell = [MINIMUM_COL_SIZE] * self.column_count
         self.Refresh()
 
     def load_list(self):
@@ -119,6 +198,7 @@ class DynamicList(wx.ListCtrl, listmix.ColumnSorterMixin):
         for x in range(0, self.column_count):
             self.InsertColumn(x, self.headers[x])
         self.SetItemCount(len(self.itemDataMap))
+        self.sort_cache = {}
         if self.sort_init:
             listmix.ColumnSorterMixin.__init__(self, self.column_count)
             self.sort_init = False
@@ -128,22 +208,38 @@ class DynamicList(wx.ListCtrl, listmix.ColumnSorterMixin):
     def get_item_text(self, idx, col, absolute=False):
         """Return the text for the given item and col."""
 
-        return util.to_ustr(self.itemDataMap[self.itemIndexMap[idx] if not absolute else idx][col])
+        return util.to_ustr(self.get_map_item(idx, col, absolute))
+
+    def get_sort_keys(self, col):
+        """Get the sort key of each row for the given column."""
+
+        return [sort_key(value) for value in self.itemDataMap.columns[col]]
+
+    def get_sort_order(self, col):
+        """
+        Get the rows in ascending order of the given column.
 
-    def GetSecondarySortValues(self, col, key1, key2):
-        """Get secondary sort values."""
+        Rows with equal values are ordered by the first column, or by the
+        second when sorting by the first. Orders are cached until the rows change.
+        """
 
-        sscol = 1 if col == 0 else 0
-        return (self.itemDataMap[key1][sscol], self.itemDataMap[key2][sscol])
+        order = self.sort_cache.get(col)
+        if order is None:
+            keys = list(zip(self.get_sort_keys(col), self.get_sort_keys(1 if col == 0 else 0)))
+            order = array(INT_COLUMN, sorted(range(len(keys)), key=keys.__getitem__))
+            self.sort_cache[col] = order
+        return order
 
     def SortItems(self, sorter=None):
-        """Sort items."""
+        """Sort items by the sort column; the sorter of `ColumnSorterMixin` is not used."""
 
-        items = list(self.itemDataMap.keys())
-        if sorter is not None:
-            util.sorted_callback(items, sorter)
+        col, ascending = self.GetSortState() if not self.sort_init else (-1, 1)
+        if col < 0 or not len(self.itemDataMap):
+            items = array(INT_COLUMN, range(len(self.itemDataMap)))
         else:
-            items.sort()
+            items = self.get_sort_order(col)
+            if not ascending:
+                items = items[::-1]
         self.itemIndexMap = items
 
         # redraw the list
@@ -21,10 +21,9 @@ IN THE SOFTWARE.
 from __future__ import unicode_literals
 from time import ctime
 import wx
-import decimal
 import os
 import functools
-from .dynamic_lists import DynamicList, USE_SAMPLE_SIZE
+from .dynamic_lists import DynamicList, INT_COLUMN, FLOAT_COLUMN, OBJECT_COLUMN
 from ..actions import fileops
 from ..localization import _
 from .. import data
@@ -77,8 +76,13 @@ class ResultFileList(DynamicList):
                 self.ENCODING,
                 self.MODIFIED,
                 self.CREATED
-            ]
+            ],
+            column_types=(
+                OBJECT_COLUMN, FLOAT_COLUMN, INT_COLUMN, OBJECT_COLUMN, OBJECT_COLUMN,
+                FLOAT_COLUMN, FLOAT_COLUMN, INT_COLUMN, INT_COLUMN
+            )
         )
+        self.file_rows = {}
         self.last_moused = (-1, "")
         self.Bind(wx.EVT_LEFT_DCLICK, self.on_dclick)
         self.Bind(wx.EVT_MOTION, self.on_motion)
@@ -116,23 +120,27 @@ class ResultFileList(DynamicList):
 
         if file_search:
             self.set_item_map(
-                obj.name,
-                os.path.basename(obj.name), decimal.Decimal(obj.size) / decimal.Decimal(1024), 0,
+                os.path.basename(obj.name), obj.size / 1024.0, 0,
                 os.path.dirname(obj.name), '', obj.modified,
                 obj.created, 1, 1
             )
         else:
-            item_id = "%d" % obj.info.id
-            if item_id in self.itemDataMap:
-                self.increment_match_count(item_id)
+            row = self.file_rows.get(obj.info.id)
+            if row is not None:
+                self.increment_match_count(row)
             else:
-                self.set_item_map(
-                    item_id,
-                    os.path.basename(obj.info.name), decimal.Decimal(obj.info.size) / decimal.Decimal(1024), 1,
+                self.file_rows[obj.info.id] = self.set_item_map(
+                    os.path.basename(obj.info.name), obj.info.size / 1024.0, 1,
                     os.path.dirname(obj.info.name), obj.info.encoding, obj.info.modified,
                     obj.info.created, obj.match.lineno, obj.match.colno
                 )
 
+    def reset_list(self):
+        """Reset the list."""
+
+        self.file_rows = {}
+        super(ResultFileList, self).reset_list()
+
     def on_enter_window(self, event):
         """Reset last moused over item tracker on mouse entering the window."""
 
@@ -147,8 +155,10 @@ class ResultFileList(DynamicList):
         if item != -1:
             actual_item = self.itemIndexMap[item]
             if actual_item != self.last_moused[0]:
-                d = self.itemDataMap[actual_item]
-                self.last_moused = (actual_item, os.path.join(d[3], d[0]))
+                self.last_moused = (
+                    actual_item,
+                    os.path.join(self.itemDataMap.get(actual_item, 3), self.itemDataMap.get(actual_item, 0))
+                )
             self.GetParent().GetParent().GetParent().GetParent().m_statusbar.set_timed_status(self.last_moused[1])
         event.Skip()
 
@@ -157,33 +167,24 @@ class ResultFileList(DynamicList):
 
         if not absolute:
             item = self.itemIndexMap[item]
+        value = self.itemDataMap.get(item, col)
         if col == 1:
-            return '%.2fKB' % round(self.itemDataMap[item][col], 2)
+            return '%.2fKB' % round(value, 2)
         elif col in [5, 6]:
-            return ctime(self.itemDataMap[item][col])
+            return ctime(value)
         else:
-            return util.to_ustr(self.itemDataMap[item][col])
+            return util.to_ustr(value)
 
     def OnGetItemImage(self, item):
         """Override method to get the image for the given item."""
 
-        encoding = self.itemDataMap[self.itemIndexMap[item]][4]
+        encoding = self.itemDataMap.get(self.itemIndexMap[item], 4)
         return 1 if encoding == "BIN" else 0
 
     def increment_match_count(self, idx):
         """Increment the match count of the given item."""
 
-        entry = list(self.itemDataMap[idx])
-        entry[2] += 1
-        self.itemDataMap[idx] = tuple(entry)
-        # Sample the first "size_sample" to determine
-        # column width for when table first loads
-        if idx <= self.last_idx_sized or not USE_SAMPLE_SIZE:
-            text = self.get_item_text(idx, 2, True)
-            lw = self.dc.GetFullTextExtent(text)[0]
-            width = lw + 30
-            if width > self.widest_cell[2]:
-                self.widest_cell[2] = width
+        self.itemDataMap.increment(idx, 2)
 
     def on_dclick(self, event):
         """Open file at in editor with optional line and column argument."""
@@ -239,8 +240,13 @@ class ResultContentList(DynamicList):
                 self.LINE,
                 self.MATCHES,
                 self.CONTEXT
-            ]
+            ],
+            column_types=(
+                OBJECT_COLUMN, INT_COLUMN, INT_COLUMN, OBJECT_COLUMN, INT_COLUMN, INT_COLUMN, OBJECT_COLUMN
+            )
         )
+        self.current_file = None
+        self.line_rows = {}
         self.last_moused = (-1, "")
         self.Bind(wx.EVT_LEFT_DCLICK, self.on_dclick)
         self.Bind(wx.EVT_MOTION, self.on_motion)
@@ -278,7 +284,7 @@ class ResultContentList(DynamicList):
         if item != -1:
             actual_item = self.itemIndexMap[item]
             if actual_item != self.last_moused[0]:
-                pth = self.itemDataMap[actual_item][0]
+                pth = self.itemDataMap.get(actual_item, 0)
                 self.last_moused = (actual_item, os.path.join(pth[1], pth[0]))
             self.GetParent().GetParent().GetParent().GetParent().m_statusbar.set_timed_status(self.last_moused[1])
         event.Skip()
@@ -289,44 +295,48 @@ class ResultContentList(DynamicList):
         if not absolute:
             item = self.itemIndexMap[item]
         if col == 0:
-            return util.to_ustr(self.itemDataMap[item][col][0])
+            return util.to_ustr(self.itemDataMap.get(item, col)[0])
         else:
-            return util.to_ustr(self.itemDataMap[item][col])
+            return util.to_ustr(self.itemDataMap.get(item, col))
 
     def increment_match_count(self, idx):
         """Increment the match count of the given item."""
 
-        entry = list(self.itemDataMap[idx])
-        entry[2] += 1
-        self.itemDataMap[idx] = tuple(entry)
-        # Sample the first "size_sample" to determine
-        # column width for when table first loads
-        if idx <= self.last_idx_sized or not USE_SAMPLE_SIZE:
-            text = self.get_item_text(idx, 2, True)
-            lw = self.dc.GetFullTextExtent(text)[0]
-            width = lw + 30
-            if width > self.widest_cell[2]:
-                self.widest_cell[2] = width
+        self.itemDataMap.increment(idx, 2)
 
     def set_match(self, obj):
         """Set the match."""
 
-        item_id = "%d:%d" % (obj.info.id, obj.match.lineno)
-        if item_id in self.itemDataMap:
-            self.increment_match_count(item_id)
+        # The matches of a file are received together, so only the rows
+        # of the current file need to be tracked to find repeated lines.
+        if self.current_file is None or self.current_file[0] != obj.info.id:
+            self.current_file = (
+                obj.info.id, (os.path.basename(obj.info.name), os.path.dirname(obj.info.name))
+            )
+            self.line_rows = {}
+
+        row = self.line_rows.get(obj.match.lineno)
+        if row is not None:
+            self.increment_match_count(row)
         else:
-            self.set_item_map(
-                item_id,
-                (os.path.basename(obj.info.name), os.path.dirname(obj.info.name)),
+            self.line_rows[obj.match.lineno] = self.set_item_map(
+                self.current_file[1],
                 obj.match.lineno, 1,
                 obj.match.lines.replace("\r", "").split("\n")[0],
-                "%d" % obj.info.id, obj.match.colno, obj.info.encoding
+                obj.info.id, obj.match.colno, obj.info.encoding
             )
 
+    def reset_list(self):
+        """Reset the list."""
+
+        self.current_file = None
+        self.line_rows = {}
+        super(ResultContentList, self).reset_list()
+
     def OnGetItemImage(self, item):
         """Override method to get the image for the given item."""
 
-        encoding = self.itemDataMap[self.itemIndexMap[item]][6]
+        encoding = self.itemDataMap.get(self.itemIndexMap[item], 6)
         return 1 if encoding == "BIN" else 0
 
     def on_dclick(self, event):
@@ -337,10 +347,7 @@ class ResultContentList(DynamicList):
         if item != -1:
             filename = self.GetItem(item, col=0).GetText()
             line = self.GetItem(item, col=1).GetText()
-            file_row = self.get_map_item(item, col=4)
             col = str(self.get_map_item(item, col=5))
-            path = self.GetParent().GetParent().GetParent().GetParent().m_result_file_list.get_map_item(
-                file_row, col=3, absolute=True
-            )
+            path = self.get_map_item(item, col=0)[1]
             fileops.open_editor(os.path.join(os.path.normpath(path), filename), line, col)
         event.Skip()
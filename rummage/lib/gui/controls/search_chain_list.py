@@ -60,4 +60,4 @@ class SearchChainList(DynamicList):
 
         if not absolute:
             item = self.itemIndexMap[item]
-        return self.itemDataMap[item][col]
+        return self.itemDataMap.get(item, col)
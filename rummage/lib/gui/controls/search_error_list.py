@@ -63,9 +63,9 @@ class ErrorList(DynamicList):
         if not absolute:
             item = self.itemIndexMap[item]
         if col == 0:
-            return self.itemDataMap[item][col][0]
+            return self.itemDataMap.get(item, col)[0]
         else:
-            return self.itemDataMap[item][col]
+            return self.itemDataMap.get(item, col)
 
     def on_dclick(self, event):
         """Open file at in editor with optional line and column argument."""
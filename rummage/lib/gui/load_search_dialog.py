@@ -81,14 +81,12 @@ class LoadSearchDialog(gui.LoadSearchDialog):
     def load_searches(self):
         """Populate list with search entries."""
 
-        count = 0
         searches = Settings.get_search()
         for key in sorted(searches.keys()):
             s = searches[key]
             search_type = self.SEARCH_REGEX if s[4] else self.SEARCH_LITERAL
             replace_type = self.REPLACE_PLUGIN if s[5] else self.REPLACE_PATTERN
-            self.m_search_list.set_item_map(count, key, s[0], s[1], s[2], s[3], search_type, replace_type)
-            count += 1
+            self.m_search_list.set_item_map(key, s[0], s[1], s[2], s[3], search_type, replace_type)
         self.m_search_list.load_list()
 
     def edit(self, item):
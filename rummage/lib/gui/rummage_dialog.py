@@ -23,6 +23,7 @@ import wx
 import wx.adv
 import threading
 import traceback
+from collections import deque
 import webbrowser
 from time import time
 import os
@@ -59,14 +60,9 @@ import decimal
 
 PostResizeEvent, EVT_POST_RESIZE = wx.lib.newevent.NewEvent()
 
-_LOCK = threading.Lock()
-_RESULTS = []
-_COMPLETED = 0
-_TOTAL = 0
-_RECORDS = 0
-_SKIPPED = 0
-_ERRORS = []
-_ABORT = False
+# Slowest and fastest refresh rates (per second) of the results during a search
+MIN_REFRESH_RATE = 10
+MAX_REFRESH_RATE = 30
 
 LIMIT_COMPARE = {
     0: "any",
@@ -244,6 +240,12 @@ class RummageThread(threading.Thread):
         self.runtime = ""
         self.no_results = 0
         self.running = False
+        self.abort = False
+        # Batches of results are appended by the thread and popped by the UI;
+        # both ends of a `deque` are thread safe, so neither side takes a lock.
+        self.results = deque()
+        self.errors = []
+        self.status = (0, 0, 0, 0)
         self.file_search = len(args['chain']) == 0
 
         self.rummage = rumcore.Rummage(
@@ -257,7 +259,9 @@ class RummageThread(threading.Thread):
             created=args['created_compare'],
             size=args['size_compare'],
             backup_location=args['backup_location'],
-            regex_mode=args['regex_mode']
+            regex_mode=args['regex_mode'],
+            workers=args['workers'],
+            encoding_cache=args['encoding_cache']
         )
 
         threading.Thread.__init__(self)
@@ -272,60 +276,55 @@ class RummageThread(threading.Thread):
 
         return item if item is not None else alt
 
-    def update_status(self):
+    def update_status(self, status=None):
         """Update status."""
 
-        global _COMPLETED
-        global _TOTAL
-        global _RECORDS
-        global _SKIPPED
-
-        with _LOCK:
-            _COMPLETED, _TOTAL, _SKIPPED, _RECORDS = self.rummage.get_status()
-            _RECORDS -= self.no_results
+        completed, total, skipped, records = self.rummage.get_status() if status is None else status
+        self.status = (completed, total, skipped, records - self.no_results)
 
     def done(self):
         """Check if thread is done running."""
 
         return not self.running
 
+    def kill(self):
+        """Abort the search."""
+
+        self.abort = True
+
+    def get_results(self):
+        """Get the results found since the last call."""
+
+        results = []
+        while self.results:
+            results.extend(self.results.popleft())
+        return results
+
     def payload(self):
         """Execute the rummage command and gather results."""
 
-        global _RESULTS
-        global _COMPLETED
-        global _TOTAL
-        global _RECORDS
-        global _ERRORS
-        global _SKIPPED
-        with _LOCK:
-            _RESULTS = []
-            _COMPLETED = 0
-            _TOTAL = 0
-            _RECORDS = 0
-            _SKIPPED = 0
-            _ERRORS = []
-        for f in self.rummage.find():
-            with _LOCK:
+        for batch, status in self.rummage.find_batches():
+            results = []
+            for f in batch:
                 if hasattr(f, 'skipped') and f.skipped:
                     self.no_results += 1
                 elif f.error is None and (self.file_search or f.match is not None):
-                    _RESULTS.append(f)
+                    results.append(f)
                 else:
                     if isinstance(f, rumcore.FileRecord):
                         self.no_results += 1
                     if f.error is not None:
-                        _ERRORS.append(f)
-            self.update_status()
-            wx.WakeUpIdle()
+                        self.errors.append(f)
+            if results:
+                self.results.append(results)
+            self.update_status(status)
 
-            if _ABORT:
+            if self.abort:
                 self.rummage.kill()
 
     def run(self):
         """Start the Rummage thread benchmark the time."""
 
-        global _ABORT
         self.running = True
         start = time()
 
@@ -338,10 +337,8 @@ class RummageThread(threading.Thread):
         runtime = self.BENCHMARK_STATUS % bench
 
         self.runtime = runtime
-        self.running = False
         self.update_status()
-        if _ABORT:
-            _ABORT = False
+        self.running = False
 
 
 class RummageArgs(object):
@@ -434,8 +431,8 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
             debug_event=(self.on_debug_console if debug_mode else None)
         )
 
-        # Update status on when idle
-        self.Bind(wx.EVT_IDLE, self.on_idle)
+        # Update status on a timer while searching
+        self.init_update_timer()
         self.Bind(wx.EVT_SIZE, self.on_resize)
         self.Bind(EVT_POST_RESIZE, self.on_post_resize)
 
@@ -1024,7 +1021,6 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
     def start_search(self, replace=False):
         """Initiate search or stop search depending on search state."""
 
-        global _ABORT
         if self.debounce_search:
             return
         self.debounce_search = True
@@ -1040,7 +1036,7 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
                     self.m_replace_button.SetLabel(self.SEARCH_BTN_ABORT)
                 else:
                     self.m_search_button.SetLabel(self.SEARCH_BTN_ABORT)
-                _ABORT = True
+                self.thread.kill()
                 self.kill = True
             else:
                 self.debounce_search = False
@@ -1116,6 +1112,7 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
         # Run search thread
         self.thread.start()
         self.allow_update = True
+        self.start_update_timer()
 
     def chain_flags(self, string, regexp):
         """Chain flags."""
@@ -1390,7 +1387,9 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
             'created_compare': args.created_compare,
             'size_compare': args.size_compare,
             'backup_location': args.backup_location,
-            'regex_mode': args.regex_mode
+            'regex_mode': args.regex_mode,
+            'workers': Settings.get_search_workers(),
+            'encoding_cache': Settings.get_encoding_cache_file()
         }
 
         # Save GUI history
@@ -1524,16 +1523,10 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
             self.checking = True
             is_complete = self.thread.done()
             debug("Processing current results")
-            with _LOCK:
-                completed = _COMPLETED
-                total = _TOTAL
-                records = _RECORDS
-                skipped = _SKIPPED
+            completed, total, skipped = self.thread.status[:3]
+            results = self.thread.get_results()
             count = self.count
-            if records > count or not is_complete:
-                with _LOCK:
-                    results = _RESULTS[0:records - count]
-                    del _RESULTS[0:records - count]
+            if results or not is_complete:
                 count = self.update_table(count, completed, total, skipped, *results)
             else:
                 self.m_statusbar.set_status(
@@ -1579,9 +1572,6 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
                     elif Settings.get_alert():
                         notify.play_alert()
                     self.kill = False
-                    global _ABORT
-                    if _ABORT:
-                        _ABORT = False
                 else:
                     self.m_statusbar.set_status(
                         self.FINAL_STATUS % (
@@ -1603,9 +1593,7 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
                         )
                     elif Settings.get_alert():
                         notify.play_alert()
-                with _LOCK:
-                    errors = _ERRORS[:]
-                    del _ERRORS[:]
+                errors = self.thread.errors
                 if errors:
                     self.error_dlg = SearchErrorDialog(self, errors)
                     self.m_statusbar.set_icon(
@@ -2072,11 +2060,47 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
         self.start_search(replace=True)
         event.Skip()
 
-    def on_idle(self, event):
-        """On idle event."""
+    def init_update_timer(self):
+        """Init the update Timer object."""
+
+        self.update_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_update_timer, self.update_timer)
+
+    def start_update_timer(self):
+        """Start update timer at the configured refresh rate."""
 
+        rate = min(max(Settings.get_refresh_rate(), MIN_REFRESH_RATE), MAX_REFRESH_RATE)
+        self.min_update_interval = 1000 // rate
+        self.max_update_interval = 1000 // MIN_REFRESH_RATE
+        self.update_interval = self.min_update_interval
+        self.update_timer.Start(self.update_interval)
+
+    def stop_update_timer(self):
+        """Stop update timer."""
+
+        if self.update_timer.IsRunning():
+            self.update_timer.Stop()
+
+    def on_update_timer(self, event):
+        """Show the results gathered since the last tick and adapt the rate to how long that took."""
+
+        start = time()
         self.check_updates()
-        event.Skip()
+        if self.thread is None:
+            self.stop_update_timer()
+            return
+
+        # Back off while updates take more than half of a tick, so the UI still gets
+        # time to handle input, and speed back up once they are cheap again.
+        elapsed = (time() - start) * 1000
+        interval = self.update_interval
+        if elapsed > interval / 2:
+            interval = min(interval * 2, self.max_update_interval)
+        elif elapsed < interval / 8:
+            interval = max(interval * 3 // 4, self.min_update_interval)
+        if interval != self.update_interval:
+            self.update_interval = interval
+            self.update_timer.Start(interval)
 
     def on_error_click(self, event):
         """Handle error icon click."""
@@ -2130,10 +2154,9 @@ class RummageFrame(gui.RummageFrame, DebugFrameExtender):
     def on_close(self, event):
         """Ensure thread is stopped, notifications are destroyed, debug console is closed."""
 
-        global _ABORT
-
         if self.thread is not None:
-            _ABORT = True
+            self.thread.kill()
+        self.stop_update_timer()
         notify.destroy_notifications()
         self.close_debug_console()
         event.Skip()
@@ -67,13 +67,11 @@ class SearchChainDialog(gui.SearchChainDialog):
     def load_chains(self):
         """Populate list with chain entries."""
 
-        count = 0
         chains = Settings.get_chains()
         for key in sorted(chains.keys()):
             c = chains[key]
             searches = ';'.join(c)
-            self.m_chain_list.set_item_map(count, key, searches)
-            count += 1
+            self.m_chain_list.set_item_map(key, searches)
         self.m_chain_list.load_list()
 
     def edit_chain(self, name=None):
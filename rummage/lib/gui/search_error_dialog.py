@@ -63,7 +63,6 @@ class SearchErrorDialog(gui.SearchErrorDialog):
     def load_errors(self, errors):
         """Populate list with error entries."""
 
-        count = 0
         for e in errors:
             if hasattr(e, 'info'):
                 name = e.info.name if e.info.name is not None else ''
@@ -72,6 +71,5 @@ class SearchErrorDialog(gui.SearchErrorDialog):
             error(
                 self.ERR_COULD_NOT_PROCESS % (name, e.error[1] + e.error[0])
             )
-            self.m_error_list.set_item_map("%d" % count, e.error, name)
-            count += 1
+            self.m_error_list.set_item_map(e.error, name)
         self.m_error_list.load_list()
@@ -38,6 +38,7 @@ SETTINGS_FILE = "rummage.settings"
 CACHE_FILE = "rummage.cache"
 LOG_FILE = "rummage.log"
 FIFO = "rummage.fifo"
+ENCODING_CACHE_FILE = "rummage_encoding.db"
 
 NOTIFY_STYLES = {
     "osx": ["default", "growl"],
@@ -166,6 +167,20 @@ class Settings(object):
         cls.settings["hide_limit"] = hide
         cls.save_settings()
 
+    @classmethod
+    def get_search_workers(cls):
+        """Get the number of processes used to search files."""
+
+        cls.reload_settings()
+        return cls.settings.get("search_workers", 1)
+
+    @classmethod
+    def get_refresh_rate(cls):
+        """Get the number of times per second results are shown during a search."""
+
+        cls.reload_settings()
+        return cls.settings.get("refresh_rate", 30)
+
     @classmethod
     def get_language(cls):
         """Get locale language."""
@@ -305,6 +320,12 @@ class Settings(object):
 
         return cls.config_folder
 
+    @classmethod
+    def get_encoding_cache_file(cls):
+        """Return the encoding cache database file."""
+
+        return os.path.join(cls.config_folder, ENCODING_CACHE_FILE)
+
     @classmethod
     def get_fifo(cls):
         """Get fifo pipe."""
@@ -21,23 +21,45 @@ IN THE SOFTWARE.
 """
 from __future__ import unicode_literals
 import sys
+import bisect
 import codecs
+import functools
 import mmap
+import multiprocessing
 import os
+import pickle
 import re
 import shutil
 import sre_parse
-from collections import namedtuple
-from fnmatch import fnmatch
+import tempfile
+import threading
+import time
+from array import array
+from collections import namedtuple, OrderedDict
+from multiprocessing.util import Finalize
+import fnmatch
 from time import ctime
 from backrefs import bre, bregex
 from collections import deque
 from . import text_decode
-from .file_times import getmtime, getctime
+from .encoding_cache import EncodingCache
+from .file_times import getmtime, getctime, getstatmtime, getstatctime
 from .file_hidden import is_hidden
 from .. import util
 if bregex.REGEX_SUPPORT:
     import regex
+if util.PY3:
+    import queue
+else:
+    import Queue as queue
+try:
+    from os import scandir
+except ImportError:  # pragma: no cover
+    from scandir import scandir
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
 
 REGEX_SUPPORT = bregex.REGEX_SUPPORT
 
@@ -74,6 +96,7 @@ PROCESS_BINARY = 0x1000000  # Process binary files
 TRUNCATE_LINES = 0x2000000  # Truncate context lines to 120 chars
 BACKUP = 0x4000000          # Backup files on replace
 BACKUP_FOLDER = 0x8000000   # Backup to folder
+DEFER_CONTEXT = 0x10000000  # Render context lines when they are first accessed
 
 RE_MODE = 0
 BRE_MODE = 1
@@ -81,12 +104,64 @@ REGEX_MODE = 2
 BREGEX_MODE = 3
 
 SEARCH_MASK = 0x1FFFF
-FILE_MASK = 0xFFE0000
+FILE_MASK = 0x1FFE0000
 
 REGEX_MODES = (REGEX_MODE, BREGEX_MODE)
 
 TRUNCATE_LENGTH = 120
 
+# Translation of binary content for display: printable ASCII is kept and everything else
+# becomes a null that is then shown as the replacement character.
+BIN_TX_TABLE = bytes(bytearray(c if 32 <= c < 127 else 0 for c in range(256)))
+
+# Glob characters that need a full pattern match
+RE_GLOB_SPECIAL = re.compile(r'[*?\[]')
+
+# Array type used to store line offsets
+LINE_MAP_TYPE = str('q' if util.PY3 else 'l')
+
+# Characters scanned at a time when looking for the first line ending
+LINE_SCAN_CHUNK = 65536
+
+# Maximum number of compiled search entries kept by a pattern cache
+PATTERN_CACHE_SIZE = 256
+
+# Files queued per worker process in parallel mode
+PARALLEL_BACKLOG = 4
+
+# Text encodings whose raw content can be checked for required literals before decoding
+PREFILTER_ENCODINGS = frozenset(('ascii', 'utf-8'))
+
+# `sre_parse` repeat and atomic group opcodes (possessive repeats and atomic groups are Python 3.11+)
+RE_REPEATS = tuple(
+    op for op in (
+        sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)
+    ) if op is not None
+)
+RE_ATOMIC_GROUP = getattr(sre_parse, 'ATOMIC_GROUP', None)
+
+# Bytes decoded at a time when streaming a text file too large to read whole
+STREAM_CHUNK_SIZE = 4194304
+# Characters kept between streamed chunks for patterns whose match length is unbounded
+STREAM_OVERLAP = 65536
+
+# Crawled files the directory walker can get ahead of the search
+CRAWL_QUEUE_SIZE = 1000
+# Seconds to wait on a queue before checking for an abort
+POLL_INTERVAL = 0.1
+# Default records per batch and milliseconds a batch can wait when finding in batches
+BATCH_SIZE = 500
+BATCH_LATENCY = 100
+
+# Replaced files synced to disk and renamed over their originals at a time
+REPLACE_SYNC_BATCH = 100
+# Prefix and extension of the temporary files replaced files are written to
+TEMP_PREFIX = '.rum-'
+TEMP_EXT = '.tmp'
+
+# Linux `ioctl` request to clone a file's content copy-on-write (`FICLONE`)
+FICLONE = 0x40049409
+
 DEFAULT_BAK = 'rum-bak'
 DEFAULT_FOLDER_BAK = '.rum-bak'
 
@@ -137,34 +212,33 @@ def get_exception():
     return (exc, tb)
 
 
-def _re_pattern(pattern, rum_flags=0, binary=False):
-    """Prepare regex search pattern flags."""
+def _re_flags(rum_flags=0, binary=False, literal=False):
+    """Get the `re` flags of a search pattern."""
 
     flags = 0
-    if rum_flags & MULTILINE:
+    if not literal and rum_flags & MULTILINE:
         flags |= re.MULTILINE
     if rum_flags & IGNORECASE:
         flags |= re.IGNORECASE
-    if rum_flags & DOTALL:
+    if not literal and rum_flags & DOTALL:
         flags |= re.DOTALL
     if not binary and rum_flags & UNICODE:
         flags |= re.UNICODE
     elif util.PY3:
         flags |= re.ASCII
-    return re.compile(pattern, flags)
+    return flags
+
+
+def _re_pattern(pattern, rum_flags=0, binary=False):
+    """Prepare regex search pattern flags."""
+
+    return re.compile(pattern, _re_flags(rum_flags, binary))
 
 
 def _re_literal_pattern(pattern, rum_flags=0, binary=False):
     """Prepare literal search pattern flags."""
 
-    flags = 0
-    if rum_flags & IGNORECASE:
-        flags |= re.IGNORECASE
-    if not binary and rum_flags & UNICODE:
-        flags |= re.UNICODE
-    elif util.PY3:
-        flags |= re.ASCII
-    return re.compile(re.escape(pattern), flags)
+    return re.compile(re.escape(pattern), _re_flags(rum_flags, binary, True))
 
 
 def _bre_pattern(pattern, rum_flags=0, binary=False):
@@ -307,6 +381,208 @@ if REGEX_SUPPORT:
         return bregex.compile_search(bregex.escape(pattern), flags)
 
 
+def _collect_literals(parsed, literals):
+    """Collect runs of literal characters that a parsed `re` pattern always requires."""
+
+    run = []
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(util.uchr(av))
+            continue
+
+        if run:
+            literals.append(''.join(run))
+            run = []
+
+        if op is sre_parse.SUBPATTERN:
+            # Python 3.6+ stores scoped flags with the group: `(group, add_flags, del_flags, pattern)`.
+            if len(av) == 4 and av[1] & re.IGNORECASE:
+                continue
+            _collect_literals(av[-1], literals)
+        elif op in RE_REPEATS:
+            if av[0] > 0:
+                _collect_literals(av[2], literals)
+        elif op is RE_ATOMIC_GROUP:
+            _collect_literals(av, literals)
+        # Anything else (alternation, classes, lookarounds, etc.) is not guaranteed to be a literal.
+
+    if run:
+        literals.append(''.join(run))
+
+
+def _get_literals(search_pattern, flags, regex_mode):
+    """
+    Get the literal strings that every match of a text search pattern must contain.
+
+    Case insensitive patterns, and patterns for which no literals can be found,
+    return `None` as the file content can't be filtered with them.
+    """
+
+    literals = None
+    if search_pattern is not None and not flags & IGNORECASE:
+        if flags & LITERAL:
+            literals = [search_pattern]
+        elif regex_mode == RE_MODE:
+            try:
+                parsed = sre_parse.parse(search_pattern)
+                state = parsed.state if hasattr(parsed, 'state') else parsed.pattern
+                if not state.flags & re.IGNORECASE:
+                    literals = []
+                    _collect_literals(parsed, literals)
+            except Exception:
+                literals = None
+        if literals:
+            # Check the longest, and most selective, literals first.
+            literals = sorted(OrderedDict.fromkeys(literals), key=len, reverse=True)
+        else:
+            literals = None
+    return literals
+
+
+def _trie_pattern(node):
+    """Get the pattern source matching the literals of a trie node, preferring the longest."""
+
+    branches = []
+    for char in sorted(k for k in node if k):
+        # Follow chains of single characters without nesting a group for each.
+        run = [re.escape(char)]
+        child = node[char]
+        while len(child) == 1 and '' not in child:
+            char = next(iter(child))
+            run.append(re.escape(char))
+            child = child[char]
+        branches.append(''.join(run) + _trie_pattern(child))
+
+    if not branches:
+        return ''
+    source = branches[0] if len(branches) == 1 else '(?:%s)' % '|'.join(branches)
+    if '' in node:
+        # A literal ends here, but the longer literals are tried first.
+        source = '(?:%s)?' % source
+    return source
+
+
+def _fold_case(text, unicode_fold=True):
+    """Lower text the way `re` folds case (only ASCII characters unless `unicode_fold` is enabled)."""
+
+    if unicode_fold or isinstance(text, bytes):
+        return text.lower()
+    return ''.join(c.lower() if ord(c) < 128 else c for c in text)
+
+
+def _literal_set_pattern(literals, fold=False, unicode_fold=True):
+    """
+    Get a pattern source that matches any of the literals.
+
+    The literals are compiled from a trie, so common prefixes are only
+    matched once instead of trying every literal at every position.
+    If `fold` is enabled, the pattern is for case insensitive matching, so
+    characters are lowered to share a branch with their other cases (only
+    ASCII characters unless `unicode_fold` is enabled, as with `re.ASCII`).
+    """
+
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            if fold:
+                lower = _fold_case(char, unicode_fold)
+                if len(lower) == 1:
+                    char = lower
+            node = node.setdefault(char, {})
+        node[''] = {}
+    try:
+        return _trie_pattern(trie)
+    except RuntimeError:
+        # Too deeply nested; try the literals longest first.
+        return '|'.join(re.escape(literal) for literal in sorted(literals, key=len, reverse=True))
+
+
+def _literals_overlap(literal1, literal2):
+    """Check if matches of two literals can overlap (a literal overlaps itself)."""
+
+    if literal1 in literal2 or literal2 in literal1:
+        return True
+    for size in range(1, min(len(literal1), len(literal2))):
+        if literal1.endswith(literal2[:size]) or literal2.endswith(literal1[:size]):
+            return True
+    return False
+
+
+def _replacements_commute(earlier, later):
+    """
+    Check if two literal replace entries can be applied in one pass instead of in turn.
+
+    Their matches must not overlap, and the earlier replacement must not create
+    matches of the later literal: it can't share any of its characters, or be
+    empty, as removing text can join what surrounds it into a match.
+    """
+
+    search1, replace1 = earlier[:2]
+    search2 = later[0]
+    if not replace1 or set(replace1) & set(search2):
+        return False
+    return not _literals_overlap(search1, search2)
+
+
+def _has_lookaround(parsed):
+    """Check if a parsed `re` pattern looks at text outside of its matches (look arounds and anchors)."""
+
+    for op, av in parsed:
+        if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT, sre_parse.AT):
+            return True
+        stack = [av]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, sre_parse.SubPattern):
+                if _has_lookaround(item):
+                    return True
+            elif isinstance(item, (tuple, list)):
+                stack.extend(item)
+    return False
+
+
+def _get_match_width(search_pattern, flags, regex_mode):
+    """
+    Get how much text around a match a search pattern can look at.
+
+    This is the longest match the pattern can make, but patterns of unknown width,
+    or with look arounds or anchors, are given `STREAM_OVERLAP`.
+    """
+
+    width = STREAM_OVERLAP
+    if flags & LITERAL:
+        # Full case folding can expand a character to as many as three.
+        width = len(search_pattern) * (3 if flags & IGNORECASE else 1)
+    elif regex_mode == RE_MODE:
+        try:
+            parsed = sre_parse.parse(search_pattern)
+            if not _has_lookaround(parsed):
+                width = parsed.getwidth()[1]
+        except Exception:
+            pass
+    return min(width, STREAM_OVERLAP)
+
+
+def _get_codec(encoding):
+    """Get the codec used to decode content of the given encoding (UTF encodings consume their BOM)."""
+
+    enc = encoding.encode
+    if enc == 'utf-8':
+        enc = 'utf-8-sig'
+    elif enc.startswith('utf-16'):
+        enc = 'utf-16'
+    elif enc.startswith('utf-32'):
+        enc = 'utf-32'
+    return enc
+
+
+def _render_binary(content):
+    """Render binary content for display."""
+
+    return content.translate(BIN_TX_TABLE).decode('ascii').replace('\x00', '\ufffd')
+
+
 class RummageException(Exception):
     """Rummage exception."""
 
@@ -323,8 +599,50 @@ class FileRecord(namedtuple('FileRecord', ['info', 'match', 'error'])):
     """A record that reports file info, matching status, and errors."""
 
 
-class MatchRecord(namedtuple('MatchRecord', ['lineno', 'colno', 'match', 'lines', 'ending', 'context'])):
-    """A record that contains match info, lineno content, context, etc."""
+class MatchRecord(namedtuple('MatchRecord', ['lineno', 'colno', 'match', 'lines', 'ending', 'context', 'entry'])):
+    """A record that contains match info, lineno content, context, the index of the search entry that matched, etc."""
+
+
+class DeferredLines(object):
+    """
+    Context lines that are sliced from the searched content when rendered.
+
+    Text files with many matches reference the whole decoded buffer, which is shared
+    by their matches, while sparse matches and binary files hold only their snippet.
+    When pickled, only the snippet is sent.
+    """
+
+    __slots__ = ('content', 'start', 'end')
+
+    def __init__(self, content, start, end):
+        """Initialize."""
+
+        self.content = content
+        self.start = start
+        self.end = end
+
+    def __reduce__(self):
+        """Pickle only the snippet."""
+
+        return (DeferredLines, (self.content[self.start:self.end], 0, self.end - self.start))
+
+    def render(self):
+        """Render the context lines."""
+
+        lines = self.content[self.start:self.end]
+        return _render_binary(lines) if isinstance(lines, util.bstr) else lines
+
+
+class DeferredMatchRecord(MatchRecord):
+    """A match record whose context lines are rendered when accessed."""
+
+    __slots__ = ()
+
+    @property
+    def lines(self):
+        """Render the context lines."""
+
+        return tuple.__getitem__(self, 3).render()
 
 
 class BufferRecord(namedtuple('BufferRecord', ['content', 'error'])):
@@ -335,6 +653,122 @@ class ErrorRecord(namedtuple('ErrorRecord', ['error'])):
     """A record for non-file related errors."""
 
 
+class FileMatchesRecord(object):
+    """
+    A compact record of consecutive matches in a file.
+
+    The file info is shared by all the matches, and the positions of each
+    match are packed in arrays.  Iterating the record yields the
+    `FileRecord`s it holds.
+    """
+
+    __slots__ = (
+        'info', 'ending', 'deferred', 'lineno', 'colno', 'start', 'end', 'before', 'after', 'entry', 'lines'
+    )
+
+    def __init__(self, info, ending=None, deferred=False):
+        """Initialize."""
+
+        self.info = info
+        self.ending = ending
+        self.deferred = deferred
+        self.lineno = array(LINE_MAP_TYPE)
+        self.colno = array(LINE_MAP_TYPE)
+        self.start = array(LINE_MAP_TYPE)
+        self.end = array(LINE_MAP_TYPE)
+        self.before = array(LINE_MAP_TYPE)
+        self.after = array(LINE_MAP_TYPE)
+        self.entry = array(LINE_MAP_TYPE)
+        self.lines = []
+
+    def __getstate__(self):
+        """Get the state for pickling."""
+
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __setstate__(self, state):
+        """Restore the state when unpickling."""
+
+        for attr, value in zip(self.__slots__, state):
+            setattr(self, attr, value)
+
+    def accepts(self, record):
+        """Check if the file record can be added."""
+
+        return (
+            record.info is self.info and record.match.ending == self.ending and
+            isinstance(record.match, DeferredMatchRecord) == self.deferred
+        )
+
+    def append(self, match):
+        """Add a match."""
+
+        self.lineno.append(match.lineno)
+        self.colno.append(match.colno)
+        self.start.append(match.match[0])
+        self.end.append(match.match[1])
+        self.before.append(match.context[0])
+        self.after.append(match.context[1])
+        self.entry.append(match.entry)
+        # Don't render deferred lines.
+        self.lines.append(tuple.__getitem__(match, 3))
+
+    def __len__(self):
+        """Get the number of matches."""
+
+        return len(self.lineno)
+
+    def __iter__(self):
+        """Iterate the file records."""
+
+        record = DeferredMatchRecord if self.deferred else MatchRecord
+        for idx in range(len(self.lineno)):
+            yield FileRecord(
+                self.info,
+                record(
+                    self.lineno[idx],
+                    self.colno[idx],
+                    (self.start[idx], self.end[idx]),
+                    self.lines[idx],
+                    self.ending,
+                    (self.before[idx], self.after[idx]),
+                    self.entry[idx]
+                ),
+                None
+            )
+
+
+def compact_records(records):
+    """Group the match records of each file into `FileMatchesRecord`s, passing other records through."""
+
+    group = None
+    for rec in records:
+        if isinstance(rec, FileRecord) and rec.match is not None:
+            if group is None or not group.accepts(rec):
+                if group is not None:
+                    yield group
+                group = FileMatchesRecord(rec.info, rec.match.ending, isinstance(rec.match, DeferredMatchRecord))
+            group.append(rec.match)
+        else:
+            if group is not None:
+                yield group
+                group = None
+            yield rec
+    if group is not None:
+        yield group
+
+
+def expand_records(records):
+    """Expand `FileMatchesRecord`s back into `FileRecord`s, passing other records through."""
+
+    for rec in records:
+        if isinstance(rec, FileMatchesRecord):
+            for file_rec in rec:
+                yield file_rec
+        else:
+            yield rec
+
+
 class Search(object):
     """Search setup object."""
 
@@ -415,17 +849,734 @@ class ReplacePlugin(object):
         return m.group(0)
 
 
+class _ScanPass(namedtuple('_ScanPass', ['pattern', 'entry'])):
+    """A pattern a file is scanned with for one search entry."""
+
+    def get_entry(self, m):
+        """Get the index of the search entry that made the match."""
+
+        return self.entry
+
+    def get_entries(self):
+        """Get the indexes of the search entries that are searched for."""
+
+        return [self.entry]
+
+
+class _ReplaceStep(namedtuple('_ReplaceStep', ['entries', 'pattern', 'replacements'])):
+    """
+    A step of a replace chain.
+
+    It either applies one replace entry, or several literal entries at once, in which
+    case `replacements` maps each literal to its position in `entries` and its replacement.
+    """
+
+
+class _LiteralSetPass(object):
+    """
+    A pattern a file is scanned with for several literal search entries at once.
+
+    The literals must not overlap (see `_literals_overlap`), so no two are the
+    same or a prefix of another, and each match is made by exactly one entry.
+    """
+
+    def __init__(self, pattern, members, re_flags):
+        """Initialize."""
+
+        self.pattern = pattern
+        self.members = members
+        self.fold = bool(re_flags & re.IGNORECASE)
+        self.unicode_fold = bool(re_flags & re.UNICODE)
+        self.entries = {}
+        self.fallback = []
+        for idx, literal in members:
+            self.entries[_fold_case(literal, self.unicode_fold) if self.fold else literal] = idx
+            if self.fold:
+                self.fallback.append((idx, re.compile(re.escape(literal), re_flags)))
+
+    def get_entry(self, m):
+        """Get the index of the search entry that made the match."""
+
+        text = m.group(0)
+        entry = self.entries.get(_fold_case(text, self.unicode_fold) if self.fold else text)
+        if entry is None:
+            # Case insensitive matches that don't lower to the literal's lowercase form.
+            for idx, literal in self.fallback:
+                found = literal.match(text)
+                if found is not None and found.end() == len(text):
+                    entry = idx
+                    break
+        return entry
+
+    def get_entries(self):
+        """Get the indexes of the search entries that are searched for."""
+
+        return [idx for idx, literal in self.members]
+
+
+class _PatternCache(object):
+    """
+    Bounded cache of compiled search entries.
+
+    Compiling a search entry is the same for every file in a search,
+    so the compiled pattern and replace objects are shared by all the
+    files searched with the given cache.
+    """
+
+    def __init__(self, max_size=PATTERN_CACHE_SIZE):
+        """Initialize."""
+
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._literals = OrderedDict()
+        self._passes = OrderedDict()
+
+    def _lookup(self, cache, key, factory, *args):
+        """Get an entry from the given cache, creating it with `factory` if needed."""
+
+        entry = cache.pop(key, None) if key in cache else factory(*args)
+        while len(cache) >= self.max_size:
+            cache.popitem(last=False)
+        cache[key] = entry
+        return entry
+
+    def _compile(self, search_pattern, replace_pattern, flags, binary, regex_mode):
+        """Compile the search pattern and the replace template."""
+
+        pattern = None
+        replace = None
+        expand = None
+        literal = False
+
+        if binary:
+            try:
+                search_pattern = util.to_ascii_bytes(search_pattern)
+            except UnicodeEncodeError:
+                raise RummageException('Unicode chars in binary search pattern')
+            if replace_pattern is not None:
+                try:
+                    replace = util.to_ascii_bytes(replace_pattern)
+                except UnicodeEncodeError:
+                    raise RummageException('Unicode chars in binary replace pattern')
+        else:
+            replace = replace_pattern
+
+        if search_pattern is not None:
+            if bool(flags & LITERAL):
+                literal = True
+                if regex_mode == BREGEX_MODE:
+                    pattern = _bregex_literal_pattern(search_pattern, flags, binary)
+                elif regex_mode == REGEX_MODE:
+                    pattern = _regex_literal_pattern(search_pattern, flags, binary)
+                elif regex_mode == BRE_MODE:
+                    pattern = _bre_literal_pattern(search_pattern, flags, binary)
+                else:
+                    pattern = _re_literal_pattern(search_pattern, flags, binary)
+            else:
+                if regex_mode == BREGEX_MODE:
+                    pattern = _bregex_pattern(search_pattern, flags, binary)
+                    if replace is not None and not bool(flags & FORMATREPLACE):
+                        expand = bregex.compile_replace(pattern, replace)
+                elif regex_mode == REGEX_MODE:
+                    pattern = _regex_pattern(search_pattern, flags, binary)
+                elif regex_mode == BRE_MODE:
+                    pattern = _bre_pattern(search_pattern, flags, binary)
+                    if replace is not None:
+                        expand = bre.compile_replace(pattern, replace)
+                else:
+                    pattern = _re_pattern(search_pattern, flags, binary)
+                    if replace is not None:
+                        template = sre_parse.parse_template(replace, pattern)
+                        expand = functools.partial(sre_parse.expand_template, template)
+
+        return pattern, replace, expand, literal
+
+    def get(self, search_pattern, replace_pattern, flags, binary, regex_mode):
+        """
+        Get the compiled search entry.
+
+        Returns the compiled pattern, the replace string (bytes if binary),
+        the compiled replace function (if any), and whether the pattern is literal.
+        """
+
+        return self._lookup(
+            self._cache, (search_pattern, replace_pattern, flags, binary, regex_mode),
+            self._compile, search_pattern, replace_pattern, flags, binary, regex_mode
+        )
+
+    def get_literals(self, search_pattern, flags, regex_mode):
+        """Get the literals required by every match of the text search entry (`None` if unknown)."""
+
+        return self._lookup(
+            self._literals, (search_pattern, flags, regex_mode),
+            _get_literals, search_pattern, flags, regex_mode
+        )
+
+    def _get_combine_key(self, search_pattern, flags, binary, regex_mode):
+        """
+        Get the `re` flags and case folded form a literal search entry is combined with others by.
+
+        `None` is returned for entries that can't be combined: other modes only match
+        literals like `re` if case is not folded (or is folded like `re`, in `BRE_MODE`),
+        and the overlap of non-ASCII literals is only checked without Unicode case folding.
+        """
+
+        if not flags & LITERAL or not search_pattern:
+            return None
+        if regex_mode in REGEX_MODES and flags & IGNORECASE:
+            return None
+        re_flags = _re_flags(flags, binary, True)
+        unicode_fold = bool(re_flags & re.UNICODE)
+        if re_flags & re.IGNORECASE:
+            if unicode_fold and any(ord(c) >= 128 for c in search_pattern):
+                return None
+            return re_flags, _fold_case(search_pattern, unicode_fold)
+        return re_flags, search_pattern
+
+    def _combine_literals(self, members, re_flags, binary):
+        """Combine literal search entries into one pattern compiled from a trie (`None` if it won't compile)."""
+
+        literals = [
+            (idx, util.to_ascii_bytes(search_pattern) if binary else search_pattern)
+            for idx, search_pattern, flags in members
+        ]
+        source = _literal_set_pattern(
+            [search_pattern for idx, search_pattern, flags in members],
+            bool(re_flags & re.IGNORECASE), bool(re_flags & re.UNICODE)
+        )
+        try:
+            pattern = re.compile(util.to_ascii_bytes(source) if binary else source, re_flags)
+        except Exception:
+            return None
+        return _LiteralSetPass(pattern, literals, re_flags)
+
+    def _get_passes(self, entries, binary, regex_mode):
+        """Group the search entries into the patterns a file is scanned with."""
+
+        passes = []
+        groups = OrderedDict()
+        for idx, entry in enumerate(entries):
+            search_pattern, replace_pattern, flags = entry
+            pattern = self.get(search_pattern, replace_pattern, flags, binary, regex_mode)[0]
+            if pattern is None:
+                continue
+            key = self._get_combine_key(search_pattern, flags, binary, regex_mode) if len(entries) > 1 else None
+            if key is None:
+                passes.append((idx, _ScanPass(pattern, idx)))
+                continue
+
+            # Add the literal to the first group with no literal its matches could overlap.
+            re_flags, folded = key
+            for group in groups.setdefault(re_flags, []):
+                if not any(_literals_overlap(folded, other) for other, member in group):
+                    group.append((folded, (idx, search_pattern, flags)))
+                    break
+            else:
+                groups[re_flags].append([(folded, (idx, search_pattern, flags))])
+
+        for re_flags, flag_groups in groups.items():
+            for group in flag_groups:
+                members = [member for folded, member in group]
+                scan = self._combine_literals(members, re_flags, binary) if len(members) > 1 else None
+                if scan is not None:
+                    passes.append((members[0][0], scan))
+                else:
+                    for idx, search_pattern, flags in members:
+                        pattern = self.get(search_pattern, entries[idx][1], flags, binary, regex_mode)[0]
+                        passes.append((idx, _ScanPass(pattern, idx)))
+
+        return [scan for idx, scan in sorted(passes, key=lambda p: p[0])]
+
+    def get_passes(self, search_obj, binary, regex_mode):
+        """
+        Get the patterns a file is scanned with to search for all the search entries.
+
+        Literal entries with the same flags whose matches can't overlap are matched
+        by one pattern compiled from a trie, so the file is scanned once for all of them
+        and every entry finds the same matches it would find on its own.  Other
+        entries are searched for with a pattern each.
+        """
+
+        entries = tuple(search_obj[idx] for idx in range(len(search_obj)))
+        return self._lookup(
+            self._passes, (entries, binary, regex_mode),
+            self._get_passes, entries, binary, regex_mode
+        )
+
+    def _get_replace_steps(self, entries, binary, regex_mode):
+        """Group the replace entries into the steps of the replace chain."""
+
+        groups = []
+        for idx, entry in enumerate(entries):
+            search_pattern, replace_pattern, flags = entry
+            fusable = (
+                bool(search_pattern) and isinstance(replace_pattern, util.string_type) and
+                bool(flags & LITERAL) and not flags & IGNORECASE
+            )
+            if (
+                fusable and groups and groups[-1][0] and
+                all(_replacements_commute(entries[i], entry) for i in groups[-1][1])
+            ):
+                groups[-1][1].append(idx)
+            else:
+                groups.append((fusable, [idx]))
+
+        steps = []
+        for fusable, members in groups:
+            step = None
+            if len(members) > 1:
+                replacements = {}
+                literals = []
+                for k, idx in enumerate(members):
+                    search_pattern, replace_pattern, flags = entries[idx]
+                    replace = self.get(search_pattern, replace_pattern, flags, binary, regex_mode)[1]
+                    literal = util.to_ascii_bytes(search_pattern) if binary else search_pattern
+                    replacements.setdefault(literal, (k, replace))
+                    literals.append(search_pattern)
+                source = _literal_set_pattern(literals)
+                try:
+                    pattern = re.compile(
+                        util.to_ascii_bytes(source) if binary else source,
+                        _re_flags(entries[members[0]][2], binary, True)
+                    )
+                    step = _ReplaceStep(tuple(members), pattern, replacements)
+                except Exception:
+                    pass
+            if step is not None:
+                steps.append(step)
+            else:
+                steps.extend(_ReplaceStep((idx,), None, None) for idx in members)
+        return steps
+
+    def get_replace_steps(self, search_obj, binary, regex_mode):
+        """
+        Get the steps a replace chain is applied in.
+
+        Consecutive case sensitive literal entries are applied in one step when
+        doing so gives the same result as applying them in turn.
+        """
+
+        entries = tuple(search_obj[idx] for idx in range(len(search_obj)))
+        return self._lookup(
+            self._passes, (entries, binary, regex_mode, 'replace'),
+            self._get_replace_steps, entries, binary, regex_mode
+        )
+
+    def clear(self):
+        """Clear the cache."""
+
+        self._cache.clear()
+        self._literals.clear()
+        self._passes.clear()
+
+
+class _LineMap(object):
+    """
+    Line ending offsets of a buffer.
+
+    The line ending is chosen from the first new line found: `\r\n` and `\n` are
+    indexed by `\n` and a lone `\r` is indexed by `\r`.  Only occurrences of the
+    chosen ending are recorded, so mixed line endings are treated as line content.
+
+    Offsets are only indexed as far as they are requested, so a few matches
+    near the top of a large file do not require scanning the rest of the file.
+    """
+
+    def __init__(self, content, binary=False, ending=None):
+        """Initialize (`ending` can be given to skip line ending detection)."""
+
+        self.content = content
+        self.size = len(content)
+        self.offsets = array(LINE_MAP_TYPE)
+        if binary:
+            self.nl = b'\n'
+            self.cr = b'\r'
+        else:
+            self.nl = '\n'
+            self.cr = '\r'
+        if ending is None:
+            self.ending, self._next = self._detect_ending()
+        else:
+            self._next = content.find(ending)
+            self.ending = ending if self._next != -1 else None
+        self.complete = self.ending is None
+        self.line_ending = self.nl if self.ending is None else self.ending
+
+    def _detect_ending(self):
+        """Find the first new line and return its line ending and offset."""
+
+        find = self.content.find
+        start = 0
+        while start < self.size:
+            end = start + LINE_SCAN_CHUNK
+            nl_offset = find(self.nl, start, end)
+            cr_offset = find(self.cr, start, nl_offset if nl_offset != -1 else end)
+            if cr_offset != -1:
+                if self.content[cr_offset + 1:cr_offset + 2] == self.nl:
+                    return self.nl, cr_offset + 1
+                return self.cr, cr_offset
+            elif nl_offset != -1:
+                return self.nl, nl_offset
+            start = end
+        return None, -1
+
+    def index(self, offset, after=0):
+        """Index line endings through `offset` and the `after + 1` line endings that follow it."""
+
+        if self.complete or (len(self.offsets) > after and self.offsets[-after - 1] >= offset):
+            return
+
+        find = self.content.find
+        ending = self.ending
+        append = self.offsets.append
+        remaining = after + 1
+        pos = find(ending, self._next)
+        while pos != -1:
+            append(pos)
+            if pos >= offset:
+                remaining -= 1
+                if not remaining:
+                    break
+            pos = find(ending, pos + 1)
+
+        if pos == -1:
+            self.complete = True
+        else:
+            self._next = pos + 1
+
+    def index_all(self):
+        """Index all the line endings."""
+
+        self.index(self.size)
+
+
+class _FileMap(object):
+    """
+    A file that is opened and memory mapped once.
+
+    The file is opened on first use and the same map is shared by
+    encoding detection, BOM checks, searching, and decoding.
+    """
+
+    def __init__(self, name):
+        """Initialize."""
+
+        self.name = name
+        self.file_obj = None
+        self.map = None
+        self.memview = None
+        self.st = None
+
+    def open(self):
+        """Open the file and return the memory map (`None` for empty files as they can't be mapped)."""
+
+        if self.file_obj is None:
+            self.file_obj = open(self.name, "rb")
+            self.st = os.fstat(self.file_obj.fileno())
+            if self.st.st_size != 0:
+                self.map = mmap.mmap(self.file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def view(self):
+        """Return a memory view of the map, so slices are not copied (the map itself on Python 2)."""
+
+        if self.memview is None:
+            content = self.open()
+            self.memview = memoryview(content) if util.PY3 and content is not None else content
+        return self.memview
+
+    def stat(self):
+        """Return the stat result of the opened file."""
+
+        self.open()
+        return self.st
+
+    def close(self):
+        """Close the memory map and the file."""
+
+        if self.memview is not None:
+            # The map can't be closed while a view of it exists.
+            if util.PY3:
+                self.memview.release()
+            self.memview = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file_obj is not None:
+            self.file_obj.close()
+            self.file_obj = None
+
+
+def _sync_file(name):
+    """Sync a file's content to disk."""
+
+    with open(name, 'r+b') as f:
+        os.fsync(f.fileno())
+
+
+def _sync_folder(folder):
+    """Sync a folder's entries to disk (folders can't be opened to be synced on Windows)."""
+
+    if util.platform() != "windows":
+        fd = os.open(folder, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _clone_file(src, dst):
+    """Clone a file's content copy-on-write (only filesystems like Btrfs and XFS on Linux support it)."""
+
+    if fcntl is None or util.platform() != "linux":
+        raise OSError("Cloning files is not supported")
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    shutil.copystat(src, dst)
+
+
+def _backup_file(src, dst, link=False):
+    """
+    Backup a file that is about to be updated.
+
+    The backup is a copy-on-write clone of the file (the target of a symlink),
+    falling back to a copy.  If `link` is enabled, as the file will be replaced
+    by a new file and not rewritten, a hard link to it is tried first.
+    """
+
+    src = os.path.realpath(src)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    methods = [_clone_file]
+    if link and hasattr(os, 'link'):
+        methods.insert(0, os.link)
+    for backup in methods:
+        try:
+            backup(src, dst)
+            return
+        except Exception:
+            pass
+    shutil.copy2(src, dst)
+
+
+def _replace_file(src, dst, in_place=False):
+    """
+    Move a file over another.
+
+    If `in_place` is enabled, the content is copied into the file instead,
+    so the file keeps its inode, and with it its other hard links.  This is
+    not atomic: if the copy fails, the file is left partly rewritten, so the
+    source is only removed once the copy is done.
+    """
+
+    if in_place:
+        with open(src, 'rb') as s, open(dst, 'r+b') as d:
+            shutil.copyfileobj(s, d, STREAM_CHUNK_SIZE)
+            d.truncate()
+            d.flush()
+            os.fsync(d.fileno())
+        os.remove(src)
+    elif util.PY3:
+        os.replace(src, dst)
+    else:
+        if util.platform() == "windows" and os.path.exists(dst):
+            # Python 2 can't rename over an existing file on Windows.
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+class _ReplaceBatch(object):
+    """
+    Updated files waiting to be renamed over their originals.
+
+    The new files are synced and renamed a batch at a time, when the batch is
+    full or a file from another folder is added, so the folder is synced once
+    per batch.  Files that fail to replace their originals are kept in `errors`.
+    """
+
+    def __init__(self, size=REPLACE_SYNC_BATCH):
+        """Initialize."""
+
+        self.size = size
+        self.folder = None
+        self.pending = []
+        self.errors = []
+
+    def add(self, temp_name, name, in_place=False):
+        """Add a file to replace with the given temporary file (or to rewrite with it if `in_place`)."""
+
+        folder = os.path.dirname(os.path.abspath(name))
+        if self.pending and (len(self.pending) >= self.size or folder != self.folder):
+            self.flush()
+        self.folder = folder
+        self.pending.append((temp_name, name, in_place))
+
+    def flush(self):
+        """Sync the batch and replace the files."""
+
+        pending = self.pending
+        self.pending = []
+        replaced = []
+        for temp_name, name, in_place in pending:
+            try:
+                # Files rewritten in place are synced too, so their new content is safe before they are rewritten.
+                _sync_file(temp_name)
+                replaced.append((temp_name, name, in_place))
+            except Exception:
+                self._fail(temp_name, name)
+
+        for temp_name, name, in_place in replaced:
+            try:
+                _replace_file(temp_name, name, in_place)
+            except Exception:
+                self._fail(temp_name, name, in_place)
+
+        if replaced:
+            try:
+                _sync_folder(self.folder)
+            except Exception:
+                pass
+
+    def _fail(self, temp_name, name, keep=False):
+        """
+        Record a file that couldn't be replaced and remove its temporary file.
+
+        The temporary file of a file that failed to be rewritten in place is kept,
+        as the file may be left partly rewritten, and the error says where it is.
+        """
+
+        error, tb = get_exception()
+        if keep:
+            error += "The new content was kept in '%s'.\n" % temp_name
+        self.errors.append((name, (error, tb)))
+        if not keep:
+            try:
+                os.remove(temp_name)
+            except Exception:
+                pass
+
+
+class _FileUpdate(object):
+    """
+    The new content of a file, encoded as it is written to a temporary file.
+
+    The temporary file is created next to the file (the target of a symlink)
+    on first write, and it only replaces the file when the update is committed.
+
+    A file with other hard links, or whose owner the temporary file can't be
+    given, is rewritten in place from the temporary file instead, so it keeps
+    its inode (see `in_place`).  That is not atomic: a failed or interrupted
+    rewrite leaves the file partly rewritten, though the new content is synced
+    beforehand and the temporary file is kept if the rewrite fails.
+    """
+
+    def __init__(self, name, encoding):
+        """Initialize."""
+
+        self.name = os.path.realpath(name)
+        self.encoding = encoding
+        self.file_obj = None
+        self.temp_name = None
+        self.in_place = False
+        self.encoder = None
+        if encoding.encode != 'bin':
+            # If a user is adding unicode to ascii,
+            # we write ascii files out as utf-8 to keep it from failing.
+            # We choose utf-8 because it is compatible with ASCII,
+            # but we could just as easily have choosen Latin-1 or CP1252.
+            enc = encoding.encode
+            self.encoder = codecs.getincrementalencoder('utf-8' if enc == 'ascii' else enc)()
+
+    def _keep_owner(self, st):
+        """Give the temporary file the file's owner and group, returning whether it could."""
+
+        if hasattr(os, 'chown'):
+            try:
+                os.chown(self.temp_name, st.st_uid, st.st_gid)
+            except OSError:
+                return False
+        return True
+
+    def open(self):
+        """Create the temporary file and write the BOM (if it isn't created yet)."""
+
+        if self.temp_name is None:
+            st = os.stat(self.name)
+            fd, self.temp_name = tempfile.mkstemp(
+                prefix=TEMP_PREFIX, suffix=TEMP_EXT, dir=os.path.dirname(self.name)
+            )
+            self.file_obj = os.fdopen(fd, 'wb')
+            self.in_place = st.st_nlink > 1 or not self._keep_owner(st)
+            if self.encoding.bom:
+                self.file_obj.write(self.encoding.bom)
+
+    def write(self, content):
+        """Write a piece of the new content."""
+
+        self.open()
+        self.file_obj.write(content if self.encoder is None else self.encoder.encode(content))
+
+    def commit(self, batch=None):
+        """
+        Replace the file with the new content.
+
+        A new file keeps the file's owner, mode, extended attributes, and access time.
+        It is synced and replaces the file right away, or with the rest of the batch
+        if one is given.
+        """
+
+        self.open()
+        if self.encoder is not None:
+            self.file_obj.write(self.encoder.encode('', True))
+        if batch is None:
+            self.file_obj.flush()
+            os.fsync(self.file_obj.fileno())
+        self.file_obj.close()
+        self.file_obj = None
+
+        if not self.in_place:
+            st = os.stat(self.name)
+            shutil.copystat(self.name, self.temp_name)
+            os.utime(self.temp_name, (st.st_atime, time.time()))
+        if batch is None:
+            try:
+                _replace_file(self.temp_name, self.name, self.in_place)
+            except Exception:
+                if self.in_place:
+                    # The file may be partly rewritten, so keep the new content.
+                    self.temp_name = None
+                raise
+            if not self.in_place:
+                _sync_folder(os.path.dirname(self.name))
+        else:
+            batch.add(self.temp_name, self.name, self.in_place)
+        self.temp_name = None
+
+    def discard(self):
+        """Remove the temporary file if the file was not replaced."""
+
+        if self.file_obj is not None:
+            self.file_obj.close()
+            self.file_obj = None
+        if self.temp_name is not None:
+            try:
+                os.remove(self.temp_name)
+            except Exception:
+                pass
+            self.temp_name = None
+
+
 class _RummageFileContent(object):
     """Either return a string or memory map file object."""
 
-    def __init__(self, name, size, encoding, file_content=None):
+    def __init__(self, name, size, encoding, file_content=None, file_map=None):
         """Initialize."""
         self.name = name
         self.size = size
         self.encoding = encoding
-        self.file_obj = None
         self.string_buffer = file_content
-        self.file_map = None
+        self.owns_map = file_map is None
+        self.file_map = _FileMap(name) if self.owns_map else file_map
 
     def __enter__(self):
         """Return content of either a memory map file or string."""
@@ -433,70 +1584,64 @@ class _RummageFileContent(object):
         return self.string_buffer if self.string_buffer else self._read_file()
 
     def __exit__(self, *args):
-        """Close file obj and memory map object if open."""
+        """Close file obj and memory map object if open (a shared map is closed by its owner)."""
 
-        if self.file_map is not None:
+        if self.owns_map:
             self.file_map.close()
-        if self.file_obj is not None:
-            self.file_obj.close()
 
     def _get_encoding(self):
         """Get the encoding."""
 
-        enc = self.encoding.encode
-        if enc == 'utf-8':
-            enc = 'utf-8-sig'
-        elif enc.startswith('utf-16'):
-            enc = 'utf-16'
-        elif enc.startswith('utf-32'):
-            enc = 'utf-32'
-        return enc
+        return _get_codec(self.encoding)
 
     def _read_bin(self):
         """Setup binary file reading with mmap."""
         try:
-            self.file_obj = open(self.name, "rb")
-            if self.size != 0:
-                self.file_map = mmap.mmap(self.file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+            content = self.file_map.open()
         except Exception:
             # _read_bin has no other fallbacks, so we issue this if it fails.
             raise RummageException("Could not access or read file.")
+        return content if content is not None else b''
 
     def _read_file(self):
         """Read the file in."""
 
         try:
             if self.encoding.encode == "bin":
-                self._read_bin()
+                return self._read_bin()
             else:
-                enc = self._get_encoding()
-                self.file_obj = codecs.open(self.name, 'r', encoding=enc)
-            return self.file_obj.read() if self.file_map is None else self.file_map
+                # Decode straight from the memory map.
+                content = self.file_map.open()
+                if content is None:
+                    return ''
+                content.seek(0)
+                return codecs.getreader(self._get_encoding())(content).read()
         except RummageException:
             # Bubble up RummageExceptions
             raise
         except Exception:
             if self.encoding.encode != "bin":
-                if self.file_obj is not None:
-                    self.file_obj.close()
                 self.encoding = text_decode.Encoding("bin", None)
-                self._read_bin()
-                return self.file_map
+                return self._read_bin()
 
 
 class _FileSearch(object):
     """Search for files."""
 
-    hex_tx_table = ("\ufffd" * 32) + "".join(chr(c) for c in range(32, 127)) + ("\ufffd" * 129)
-
     def __init__(
         self, search_obj, file_obj, file_id, flags, context, encoding,
-        backup_location, max_count, file_content=None, regex_mode=RE_MODE
+        backup_location, max_count, file_content=None, regex_mode=RE_MODE,
+        pattern_cache=None, encoding_cache=None, replace_batch=None
     ):
         """Init the file search object."""
 
         self.abort = False
         self.search_obj = search_obj
+        self.pattern_cache = pattern_cache if pattern_cache is not None else _PatternCache()
+        self.encoding_cache = encoding_cache
+        self.replace_batch = replace_batch
+        self.file_stat = None
+        self.file_map = None
         if (regex_mode in REGEX_MODES and not REGEX_SUPPORT) or (RE_MODE > regex_mode > BREGEX_MODE):
             regex_mode = RE_MODE
         self.regex_mode = regex_mode
@@ -504,12 +1649,14 @@ class _FileSearch(object):
         self.boolean = bool(self.flags & BOOLEAN)
         self.count_only = bool(self.flags & COUNT_ONLY)
         self.truncate_lines = bool(self.flags & TRUNCATE_LINES)
+        self.defer_context = bool(self.flags & DEFER_CONTEXT)
         self.process_binary = bool(self.flags & PROCESS_BINARY)
         self.backup = bool(self.flags & BACKUP)
         self.backup2folder = bool(self.flags & BACKUP_FOLDER)
         self.backup_ext = ('.%s' % backup_location) if not self.backup2folder else DEFAULT_BAK
         self.backup_folder = backup_location if self.backup2folder else DEFAULT_FOLDER_BAK
         self.bom = None
+        self.deferred_size = 0
         self.context = (0, 0) if self.truncate_lines else context
 
         # Prepare search
@@ -524,8 +1671,13 @@ class _FileSearch(object):
         self.current_encoding = None
         self.is_unicode_buffer = self.file_content is not None and isinstance(self.file_content, util.ustr)
 
-    def _get_binary_context(self, content, m):
-        """Get context info for binary file."""
+    def _get_binary_context(self, content, m, defer=False):
+        """
+        Get context info for binary file.
+
+        `content` should be a memory view of the file so the snippet is only copied once.
+        If `defer` is enabled, the raw snippet is returned to be rendered when accessed.
+        """
 
         row = 1
         col = 1
@@ -536,10 +1688,10 @@ class _FileSearch(object):
         eof = len(content) - 1
 
         match_len = m.end() - m.start()
-        overage = (TRUNCATE_LENGTH - match_len) / 2
+        overage = TRUNCATE_LENGTH - match_len
         if overage > 0:
-            start = m.start() - overage
-            end = m.end() + overage
+            start = m.start() - (overage + 1) // 2
+            end = m.end() + overage // 2
         if start < 0:
             start = 0
         if end > eof:
@@ -560,16 +1712,22 @@ class _FileSearch(object):
             if match_end > length:
                 match_end = TRUNCATE_LENGTH
 
+        snippet = bytes(content[start:end])
         return (
-            content[int(start):int(end)].decode('ascii', errors='replace').translate(self.hex_tx_table),
+            DeferredLines(snippet, 0, len(snippet)) if defer else _render_binary(snippet),
             (match_start, match_end),
             (before, after),
             row,
             col
         )
 
-    def _get_line_context(self, content, m, line_map):
-        """Get context info about the line."""
+    def _get_line_context(self, content, m, line_map, defer=False):
+        """
+        Get context info about the line.
+
+        If `defer` is enabled, the lines are deferred.  They share the content once the context lines
+        of the file's matches add up to its size, so deferring never holds more than slicing them does.
+        """
 
         win_end = b'\r\n' if self.is_binary else '\r\n'
 
@@ -637,8 +1795,17 @@ class _FileSearch(object):
         # Return the context snippet, where the match occurs,
         # and how many lines of context before and after,
         # and the row and colum of match start.
+        if defer:
+            self.deferred_size += end - start
+            if self.deferred_size >= len(content):
+                lines = DeferredLines(content, start, end)
+            else:
+                lines = DeferredLines(content[start:end], 0, end - start)
+        else:
+            lines = content[start:end]
+
         return (
-            content[start:end],
+            lines,
             (match_start, match_end),
             (before, after),
             row,
@@ -648,59 +1815,14 @@ class _FileSearch(object):
     def _get_row(self, start, line_map):
         """Get line number where result is found in file."""
 
-        # Binary Search
-        mn = 0
-        mx = len(line_map) - 1
-        if mx == -1 or start <= line_map[mn]:
-            return mn + 1
-
-        if start > line_map[-1]:
-            return mx + 2
-
-        while mx - mn != 1:
-            idx = mn + ((mx - mn) >> 1)
-            if start > line_map[idx]:
-                mn = idx
-            else:
-                mx = idx
-
-        return mx + 1
+        return bisect.bisect_left(line_map, start) + 1
 
     def _get_line_ending(self, file_content):
-        """Get the line ending for the file content by scanning for and evaluating the first new line occurance."""
+        """Get the line ending for the file content and the offsets of every line ending."""
 
-        if self.is_binary:
-            nl = b'\n'
-            cr = b'\r'
-        else:
-            nl = '\n'
-            cr = '\r'
-        line_map = []
-        ending = None
-        offset = 0
-        last_offset = None
-        for c in file_content:
-            if last_offset is not None and (c == nl or c == cr):
-                if last_offset + 1 == offset and c == nl:
-                    ending = c
-                    line_map.append(offset)
-                else:
-                    line_map.append(last_offset)
-                    if c == ending:
-                        line_map.append(offset)
-                last_offset = None
-            elif ending is None and (c == nl or c == cr):
-                ending = c
-                if ending == cr:
-                    last_offset = offset
-                else:
-                    line_map.append(offset)
-            elif c == ending:
-                line_map.append(offset)
-            offset += 1
-        if last_offset is not None:
-            line_map.append(last_offset)
-        return nl if ending is None else ending, line_map
+        line_map = _LineMap(file_content, self.is_binary)
+        line_map.index_all()
+        return line_map.line_ending, line_map.offsets
 
     def expand_match(self, m):
         """Expand the match."""
@@ -719,64 +1841,26 @@ class _FileSearch(object):
     def _findall(self, file_content, search_pattern, replace_pattern, flags, file_info):
         """Find all occurences of search pattern in file."""
 
-        replace = None
-        pattern = None
-
         if (
             replace_pattern is not None and
             not isinstance(replace_pattern, util.string_type)
         ):
-            replace_pattern = replace_pattern(file_info, flags)
+            plugin = replace_pattern
+            replace_pattern = None
             self.is_plugin_replace = True
         else:
+            plugin = None
             self.is_plugin_replace = False
 
         self.regex_format_replace = self.regex_mode in REGEX_MODES and bool(flags & FORMATREPLACE)
 
-        if self.is_binary:
-            try:
-                pattern = util.to_ascii_bytes(search_pattern)
-            except UnicodeEncodeError:
-                raise RummageException('Unicode chars in binary search pattern')
-            if replace_pattern is not None and not self.is_plugin_replace:
-                try:
-                    replace = util.to_ascii_bytes(replace_pattern)
-                except UnicodeEncodeError:
-                    raise RummageException('Unicode chars in binary replace pattern')
-        else:
-            pattern = search_pattern
-            replace = replace_pattern
+        pattern, replace, self.expand, self.literal = self.pattern_cache.get(
+            search_pattern, replace_pattern, flags, self.is_binary, self.regex_mode
+        )
 
-        self.current_replace = replace
+        self.current_replace = plugin(file_info, flags) if plugin is not None else replace
 
         if pattern is not None:
-            if bool(flags & LITERAL):
-                self.literal = True
-                if self.regex_mode == BREGEX_MODE:
-                    pattern = _bregex_literal_pattern(pattern, flags, self.is_binary)
-                elif self.regex_mode == REGEX_MODE:
-                    pattern = _regex_literal_pattern(pattern, flags, self.is_binary)
-                elif self.regex_mode == BRE_MODE:
-                    pattern = _bre_literal_pattern(pattern, flags, self.is_binary)
-                else:
-                    pattern = _re_literal_pattern(pattern, flags, self.is_binary)
-            else:
-                if self.regex_mode == BREGEX_MODE:
-                    pattern = _bregex_pattern(pattern, flags, self.is_binary)
-                    if replace is not None and not bool(flags & FORMATREPLACE) and not self.is_plugin_replace:
-                        self.expand = bregex.compile_replace(pattern, replace)
-                elif self.regex_mode == REGEX_MODE:
-                    pattern = _regex_pattern(pattern, flags, self.is_binary)
-                elif self.regex_mode == BRE_MODE:
-                    pattern = _bre_pattern(pattern, flags, self.is_binary)
-                    if replace is not None and not self.is_plugin_replace:
-                        self.expand = bre.compile_replace(pattern, replace)
-                else:
-                    pattern = _re_pattern(pattern, flags, self.is_binary)
-                    if replace is not None and not self.is_plugin_replace:
-                        template = sre_parse.parse_template(replace, pattern)
-                        self.expand = lambda m, t=template: sre_parse.expand_template(t, m)
-
             for m in pattern.finditer(file_content):
                 yield m
 
@@ -785,10 +1869,9 @@ class _FileSearch(object):
 
         return BufferRecord((b'' if self.is_binary else '').join(content), None)
 
-    def _update_file(self, file_name, content):
-        """Update the file content."""
+    def _backup_file(self, file_name, link=False):
+        """Backup the file before it is updated (see `_backup_file`)."""
 
-        encoding = self.current_encoding
         if self.backup:
             if self.backup2folder:
                 dirname = os.path.join(os.path.dirname(file_name), self.backup_folder)
@@ -796,32 +1879,67 @@ class _FileSearch(object):
                 backup = os.path.join(dirname, basename)
                 if not os.path.exists(dirname):
                     os.makedirs(dirname)
-                shutil.copy2(file_name, backup + '.bak')
+                _backup_file(file_name, backup + '.bak', link)
             else:
                 backup = file_name + self.backup_ext
-                shutil.copy2(file_name, backup)
-
-        if encoding.bom:
-            # Write the bom first, then write in utf format out in the specified order.
-            with open(file_name, 'wb') as f:
-                f.write(encoding.bom)
-            with codecs.open(file_name, 'a', encoding=encoding.encode) as f:
-                while content:
-                    f.write(content.popleft())
-        elif encoding.encode == 'bin':
-            # Write bin file.
-            with open(file_name, 'wb') as f:
-                while content:
-                    f.write(content.popleft())
+                _backup_file(file_name, backup, link)
+
+    def _replace_matches(self, content, step, file_info):
+        """
+        Find the matches of a step of the replace chain.
+
+        Yields the span of each match, its replacement, the search entry that matched,
+        and where the match starts in the content with the step's earlier entries applied.
+        """
+
+        if step.pattern is None:
+            entry = step.entries[0]
+            pattern, replace, flags = self.search_obj[entry]
+            for m in self._findall(content, pattern, replace, flags, file_info):
+                yield m.start(), m.end(), self.expand_match(m), entry, m.start()
         else:
-            # If a user is adding unicode to ascii,
-            # we write ascii files out as utf-8 to keep it from failing.
-            # We choose utf-8 because it is compatible with ASCII,
-            # but we could just as easily have choosen Latin-1 or CP1252.
-            enc = encoding.encode
-            with codecs.open(file_name, 'w', encoding=('utf-8' if enc == 'ascii' else enc)) as f:
-                while content:
-                    f.write(content.popleft())
+            growth = [0] * len(step.entries)
+            for m in step.pattern.finditer(content):
+                k, replacement = step.replacements[m.group(0)]
+                yield m.start(), m.end(), replacement, step.entries[k], m.start() + sum(growth[:k])
+                growth[k] += len(replacement) - (m.end() - m.start())
+
+    def _update_encoding_cache(self, file_name, encoding):
+        """Cache the detected encoding of the file."""
+
+        if self.encoding_cache is not None and self.file_stat is not None and encoding is not None:
+            self.encoding_cache.set(file_name, self.file_stat, encoding)
+
+    def _may_match(self):
+        """
+        Check whether any search entry could match the file.
+
+        The raw bytes of an ASCII or UTF-8 file are scanned for the literals
+        each search pattern requires, so files that can't match are never decoded.
+        """
+
+        enc = self.current_encoding.encode
+        if self.is_binary or self.file_map is None or enc not in PREFILTER_ENCODINGS:
+            return True
+
+        content = self.file_map.open()
+        for pattern, replace, flags in self.search_obj:
+            literals = self.pattern_cache.get_literals(pattern, flags, self.regex_mode)
+            if literals is None:
+                return True
+            found = True
+            for literal in literals:
+                try:
+                    literal = literal.encode(enc)
+                except UnicodeEncodeError:
+                    # The literal can't be represented in the file's encoding.
+                    found = False
+                if not found or content is None or content.find(literal) == -1:
+                    found = False
+                    break
+            if found:
+                return True
+        return False
 
     def _get_file_info(self, file_obj):
         """Create file info record."""
@@ -841,7 +1959,8 @@ class _FileSearch(object):
                     self.current_encoding = text_decode.Encoding(self.encoding, None)
                     self.is_binary = True
                 elif self.encoding.startswith(('utf-8', 'utf-16', 'utf-32')):
-                    bom = text_decode.inspect_bom(file_obj.name)
+                    content = self.file_map.open()
+                    bom = text_decode.has_bom(content[:4]) if content is not None else None
                     if bom and bom.encode.startswith(self.encoding):
                         self.current_encoding = bom
                     else:
@@ -849,8 +1968,20 @@ class _FileSearch(object):
                 else:
                     self.current_encoding = text_decode.Encoding(self.encoding, None)
             else:
-                # Guess encoding and decode file
-                encoding = text_decode.guess(file_obj.name, verify=False)
+                # Use the cached encoding if the file hasn't changed, else guess encoding.
+                encoding = None
+                if self.encoding_cache is not None:
+                    self.file_stat = self.file_map.stat()
+                    encoding = self.encoding_cache.get(file_obj.name, self.file_stat)
+                if encoding is None:
+                    encoding = text_decode.mguess(
+                        self.file_map.open(), file_obj.name, verify=False, sample_large=True
+                    )
+                    self._update_encoding_cache(file_obj.name, encoding)
+                if encoding is not None and encoding.encode != 'bin' and self.search_obj.is_replace():
+                    # Files too large to read whole are only searched as text in a stream.
+                    if self._is_streamed():
+                        encoding = text_decode.Encoding('bin', None)
                 if encoding is not None:
                     if encoding.encode == "bin":
                         self.is_binary = True
@@ -875,9 +2006,14 @@ class _FileSearch(object):
         self.abort = True
 
     def search_and_replace(self):
-        """Search and replace."""
+        """
+        Search and replace.
+
+        The replace chain is applied in steps, with the content of one step joined
+        for the next only if it changed.  The last step is written straight to the
+        file update, so a file is rewritten without holding its new content.
+        """
 
-        text = deque()
         is_buffer = True if self.file_content else False
 
         file_info, error = self._get_file_info(self.file_obj)
@@ -889,105 +2025,91 @@ class _FileSearch(object):
                 yield FileRecord(file_info, None, error)
         elif not self.is_binary or self.process_binary:
 
+            update = None
             try:
                 file_record_sent = False
+                changed = False
+                text = []
 
                 rum_content = _RummageFileContent(
-                    file_info.name, file_info.size, self.current_encoding, self.file_content
+                    file_info.name, file_info.size, self.current_encoding, self.file_content, self.file_map
                 )
                 self.file_content = None
 
-                with rum_content as rum_buff:
+                with rum_content as content:
                     skip = False
                     if self.is_binary is False and rum_content.encoding.encode == "bin":
                         self.is_binary = True
                         self.current_encoding = rum_content.encoding
+                        self._update_encoding_cache(file_info.name, self.current_encoding)
                         if not self.process_binary:
                             skip = True
                         file_info = file_info._replace(encoding=self.current_encoding.encode.upper())
 
                     if not skip:
-                        offset = 0
+                        if not is_buffer:
+                            update = _FileUpdate(file_info.name, self.current_encoding)
+
+                        steps = self.pattern_cache.get_replace_steps(self.search_obj, self.is_binary, self.regex_mode)
+                        for step in steps:
+                            text = []
+                            write = update.write if update is not None and step is steps[-1] else text.append
+                            step_changed = False
+                            offset = 0
+
+                            for start, end, replacement, entry, position in self._replace_matches(
+                                content, step, file_info
+                            ):
+                                write(content[offset:start])
+                                write(replacement)
+                                offset = end
+                                step_changed = True
 
-                        pattern, replace, flags = self.search_obj[0]
-                        for m in self._findall(rum_buff, pattern, replace, flags, file_info):
-                            text.append(rum_buff[offset:m.start(0)])
-                            text.append(self.expand_match(m))
-                            offset = m.end(0)
-
-                            yield FileRecord(
-                                file_info,
-                                MatchRecord(
-                                    0,                     # lineno
-                                    0,                     # colno
-                                    (m.start(), m.end()),  # Postion of match
-                                    None,                  # Line(s) in which match is found
-                                    None,                  # Line ending for file
-                                    (0, 0)                 # Number of lines shown before and after matched line(s)
-                                ),
-                                None
-                            )
-
-                            file_record_sent = True
-
-                            if self.abort:
-                                break
-
-                        # Grab the rest of the file if we found things to replace.
-                        if not self.abort and (text or len(self.search_obj) > 1):
-                            text.append(rum_buff[offset:])
-
-                # Additional chained replaces
-                count = 1
-                if not self.abort and len(self.search_obj) > 1:
-
-                    for pattern, replace, flags in self.search_obj[1:]:
-                        text2 = (b'' if self.is_binary else '').join(text)
-                        text = deque()
-                        offset = 0
-
-                        for m in self._findall(text2, pattern, replace, flags, file_info):
-                            text.append(text2[offset:m.start(0)])
-                            text.append(self.expand_match(m))
-                            offset = m.end(0)
+                                yield FileRecord(
+                                    file_info,
+                                    MatchRecord(
+                                        0,                                   # lineno
+                                        0,                                   # colno
+                                        (position, position + end - start),  # Postion of match
+                                        None,                                # Line(s) in which match is found
+                                        None,                                # Line ending for file
+                                        (0, 0),                              # Lines shown before and after match
+                                        entry                                # Search entry that matched
+                                    ),
+                                    None
+                                )
 
-                            yield FileRecord(
-                                file_info,
-                                MatchRecord(
-                                    0,                     # lineno
-                                    0,                     # colno
-                                    (m.start(), m.end()),  # Postion of match
-                                    None,                  # Line(s) in which match is found
-                                    None,                  # Line ending for file
-                                    (0, 0)                 # Number of lines shown before and after matched line(s)
-                                ),
-                                None
-                            )
+                                file_record_sent = True
 
-                            file_record_sent = True
+                                if self.abort:
+                                    break
 
                             if self.abort:
                                 break
 
-                        count += 1
-
-                        # Grab the rest of the file if we found things to replace.
-                        if not self.abort and (text or count < len(self.search_obj)):
-                            text.append(text2[offset:])
-
-                        if self.abort:
-                            break
-
-                if not self.abort and text:
+                            changed = changed or step_changed
+                            if step is steps[-1]:
+                                # Grab the rest of the file if we found things to replace.
+                                if changed:
+                                    write(content[offset:])
+                            elif step_changed:
+                                text.append(content[offset:])
+                                content = (b'' if self.is_binary else '').join(text)
+                                text = []
+
+                if not self.abort and changed:
                     # Update the file or buffer depending on what is being used.
                     # For a buffer, we will actually return the the content via a BufferRecord.
                     if is_buffer:
                         yield self._update_buffer(text)
                         file_record_sent = True
                     else:
-                        self._update_file(
-                            file_info.name, text
-                        )
+                        # The file must not be open when it is replaced.
+                        self.file_map.close()
+                        # A hard link backup is only safe if the file's inode is replaced.
+                        update.open()
+                        self._backup_file(file_info.name, not update.in_place)
+                        update.commit(self.replace_batch)
                 elif is_buffer:
                     # Buffers always return a Buffer record at the end
                     yield BufferRecord(None, None)
@@ -1003,106 +2125,293 @@ class _FileSearch(object):
                     yield BufferRecord(None, get_exception())
                 else:
                     yield FileRecord(file_info, None, get_exception())
+            finally:
+                if update is not None:
+                    update.discard()
 
-    def search(self):
-        """Search target file or buffer returning a generator of results."""
+    def _search_content(self, file_info):
+        """Search the file or buffer content."""
 
-        file_info, error = self._get_file_info(self.file_obj)
-        if error is not None:
-            yield FileRecord(file_info, None, error)
-        elif not self.is_binary or self.process_binary:
+        try:
+            file_record_sent = False
+            rum_content = _RummageFileContent(
+                file_info.name, file_info.size, self.current_encoding, self.file_content, self.file_map
+            )
+            self.file_content = None
+            with rum_content as rum_buff:
+
+                skip = False
+                if self.is_binary is False and rum_content.encoding.encode == "bin":
+                    self.is_binary = True
+                    self.current_encoding = rum_content.encoding
+                    self._update_encoding_cache(file_info.name, self.current_encoding)
+                    if not self.process_binary:
+                        skip = True
+                    file_info = file_info._replace(encoding=self.current_encoding.encode.upper())
+
+                if not skip:
+                    line_ending = None
+                    line_map = None
+
+                    for scan in self.pattern_cache.get_passes(self.search_obj, self.is_binary, self.regex_mode):
+                        if hasattr(rum_buff, 'seek'):
+                            rum_buff.seek(0)
+
+                        for m in scan.pattern.finditer(rum_buff):
+                            if (
+                                line_map is None and not self.boolean and
+                                not self.count_only and not self.is_binary
+                            ):
+                                line_map = _LineMap(rum_buff, self.is_binary)
+                                line_ending = line_map.line_ending
+
+                            deferred = False
+                            if not self.boolean and not self.count_only:
+                                # Get line related context.
+                                deferred = self.defer_context
+                                if self.is_binary:
+                                    lines, match, context, row, col = self._get_binary_context(
+                                        self.file_map.view() if self.file_map is not None else rum_buff, m, deferred
+                                    )
+                                else:
+                                    line_map.index(m.start(), self.context[1])
+                                    lines, match, context, row, col = self._get_line_context(
+                                        rum_buff, m, line_map.offsets, deferred
+                                    )
+                            else:
+                                row = 1
+                                col = 1
+                                match = (m.start(), m.end())
+                                lines = None
+                                line_ending = None
+                                context = (0, 0)
+
+                            file_record_sent = True
+
+                            yield FileRecord(
+                                file_info,
+                                (DeferredMatchRecord if deferred else MatchRecord)(
+                                    row,          # lineno
+                                    col,          # colno
+                                    match,        # Postion of match
+                                    lines,        # Line(s) in which match is found
+                                    line_ending,  # Line ending for file
+                                    context,      # Number of lines shown before and after matched line(s)
+                                    scan.get_entry(m)  # Search entry that matched
+                                ),
+                                None
+                            )
+
+                            if self.boolean:
+                                break
+
+                            # Have we exceeded the maximum desired matches?
+                            if self.max_count is not None:
+                                self.max_count -= 1
+
+                                if self.max_count == 0:
+                                    break
+
+                            if self.abort:
+                                break
+
+                        if self.abort:
+                            break
+
+            if not file_record_sent:
+                yield FileRecord(file_info, None, None)
+        except Exception:
+            yield FileRecord(
+                file_info, None,
+                get_exception()
+            )
+
+    def _is_streamed(self):
+        """Check if the file is a text file too large to read whole, so it must be searched in a stream."""
+
+        return (
+            self.file_map is not None and not self.is_binary and
+            self.file_map.stat().st_size >= text_decode.MAX_GUESS_SIZE
+        )
+
+    def _stream_findall(self, scan):
+        """
+        Find the matches of a scan pass in a text file decoded a chunk at a time.
+
+        Only a window of the decoded text is kept: the context lines of the next
+        match and enough characters to find matches that span chunks.
+        """
+
+        pattern = scan.pattern
+        context = not self.boolean and not self.count_only
+        before, after = self.context
+        width = max(
+            _get_match_width(self.search_obj[idx][0], self.search_obj[idx][2], self.regex_mode)
+            for idx in scan.get_entries()
+        )
+        content = self.file_map.open()
+        size = len(content)
+        decoder = codecs.getincrementaldecoder(_get_codec(self.current_encoding))()
+        ending = None
+        text = ''
+        base = 0
+        row = 1
+        pos = 0
+        empty_at = -1
+        offset = 0
+        done = False
+
+        while not done:
+            chunk = content[offset:offset + STREAM_CHUNK_SIZE]
+            offset += len(chunk)
+            done = offset >= size
+            text += decoder.decode(chunk, done)
+            length = len(text)
+
+            # Wait for the next chunk if a `\r` at the end could be part of a `\r\n`:
+            # matches are held until the line ending is known.
+            if ending is None:
+                if not done and text.endswith('\r'):
+                    continue
+                ending = _LineMap(text).ending
+            line_map = _LineMap(text, ending=ending) if ending is not None else None
+
+            # Matches must start before `safe` to be sure they are not cut short by the end of the window.
+            safe = length + 1 if done else length - width - 1
+            for m in pattern.finditer(text, pos):
+                start = m.start()
+                if start == empty_at and m.end() == start:
+                    continue
+                if start >= safe:
+                    break
+
+                if context:
+                    if line_map is None:
+                        line_map = _LineMap(text)
+                    line_map.index(start, after)
+                    offsets = line_map.offsets
+                    if (
+                        not done and len(offsets) <= bisect.bisect_left(offsets, start) + after and
+                        length - start < STREAM_OVERLAP
+                    ):
+                        # Wait for the lines that follow the match.
+                        safe = start
+                        break
+                    lines, match, match_context, lineno, colno = self._get_line_context(text, m, offsets)
+                    lineno += row - 1
+                    line_ending = ending if ending is not None else '\n'
+                else:
+                    lineno = 1
+                    colno = 1
+                    match = (base + start, base + m.end())
+                    lines = None
+                    line_ending = None
+                    match_context = (0, 0)
+
+                pos = m.end()
+                empty_at = pos if start == pos else -1
 
-            try:
-                file_record_sent = False
-                rum_content = _RummageFileContent(
-                    file_info.name, file_info.size, self.current_encoding, self.file_content
-                )
-                self.file_content = None
-                with rum_content as rum_buff:
+                yield MatchRecord(lineno, colno, match, lines, line_ending, match_context, scan.get_entry(m))
 
-                    skip = False
-                    if self.is_binary is False and rum_content.encoding.encode == "bin":
-                        self.is_binary = True
-                        self.current_encoding = rum_content.encoding
-                        if not self.process_binary:
-                            skip = True
-                        file_info = file_info._replace(encoding=self.current_encoding.encode.upper())
+                if self.abort:
+                    return
 
-                    if not skip:
-                        line_ending = None
-                        line_map = []
-
-                        for pattern, replace, flags in self.search_obj:
-                            if hasattr(rum_buff, 'seek'):
-                                rum_buff.seek(0)
-
-                            for m in self._findall(rum_buff, pattern, replace, flags, file_info):
-                                if (
-                                    line_ending is None and not self.boolean and
-                                    not self.count_only and not self.is_binary
-                                ):
-                                    line_ending, line_map = self._get_line_ending(rum_buff)
-
-                                if not self.boolean and not self.count_only:
-                                    # Get line related context.
-                                    if self.is_binary:
-                                        lines, match, context, row, col = self._get_binary_context(
-                                            rum_buff, m
-                                        )
-                                    else:
-                                        lines, match, context, row, col = self._get_line_context(
-                                            rum_buff, m, line_map
-                                        )
-                                else:
-                                    row = 1
-                                    col = 1
-                                    match = (m.start(), m.end())
-                                    lines = None
-                                    line_ending = None
-                                    context = (0, 0)
+            if done:
+                break
 
-                                file_record_sent = True
+            # Drop the text before the context lines of the next match, keeping the width
+            # of the pattern before the search position so look behinds still see it.
+            pos = max(pos, safe)
+            keep = 0
+            if ending is not None:
+                keep = pos
+                for x in range(before + 1):
+                    keep = text.rfind(ending, 0, keep)
+                    if keep == -1:
+                        break
+                keep += 1
+            keep = max(min(keep, pos - max(width, 1)), pos - STREAM_OVERLAP, 0)
+            if ending is not None:
+                row += text.count(ending, 0, keep)
+            text = text[keep:]
+            base += keep
+            pos -= keep
+            if empty_at != -1:
+                empty_at -= keep
+
+    def _stream_search(self, file_info):
+        """Search a text file too large to read whole."""
+
+        file_record_sent = False
+        fallback = False
+        try:
+            for scan in self.pattern_cache.get_passes(self.search_obj, False, self.regex_mode):
+                for record in self._stream_findall(scan):
+                    file_record_sent = True
 
-                                yield FileRecord(
-                                    file_info,
-                                    MatchRecord(
-                                        row,          # lineno
-                                        col,          # colno
-                                        match,        # Postion of match
-                                        lines,        # Line(s) in which match is found
-                                        line_ending,  # Line ending for file
-                                        context       # Number of lines shown before and after matched line(s)
-                                    ),
-                                    None
-                                )
+                    yield FileRecord(file_info, record, None)
 
-                                if self.boolean:
-                                    break
+                    if self.boolean:
+                        break
 
-                                # Have we exceeded the maximum desired matches?
-                                if self.max_count is not None:
-                                    self.max_count -= 1
+                    # Have we exceeded the maximum desired matches?
+                    if self.max_count is not None:
+                        self.max_count -= 1
 
-                                    if self.max_count == 0:
-                                        break
+                        if self.max_count == 0:
+                            break
 
-                                if self.abort:
-                                    break
+                    if self.abort:
+                        break
 
-                            if self.abort:
-                                break
+                if self.abort:
+                    break
+        except UnicodeError:
+            # Like other text files, a file that fails to decode is treated as binary,
+            # but only if nothing has been reported from it yet.
+            if file_record_sent:
+                yield FileRecord(file_info, None, get_exception())
+            else:
+                fallback = True
+            file_record_sent = True
+        except Exception:
+            yield FileRecord(file_info, None, get_exception())
+            file_record_sent = True
 
-                if not file_record_sent:
-                    yield FileRecord(file_info, None, None)
-            except Exception:
-                yield FileRecord(
-                    file_info, None,
-                    get_exception()
-                )
+        if fallback:
+            self.is_binary = True
+            self.current_encoding = text_decode.Encoding('bin', None)
+            self._update_encoding_cache(file_info.name, self.current_encoding)
+            file_info = file_info._replace(encoding=self.current_encoding.encode.upper())
+            if self.process_binary:
+                for rec in self._search_content(file_info):
+                    yield rec
+            else:
+                yield FileRecord(file_info, None, None)
+        elif not file_record_sent:
+            yield FileRecord(file_info, None, None)
+
+    def search(self):
+        """Search target file or buffer returning a generator of results."""
+
+        file_info, error = self._get_file_info(self.file_obj)
+        if error is not None:
+            yield FileRecord(file_info, None, error)
+        elif not self._may_match():
+            yield FileRecord(file_info, None, None)
+        elif self._is_streamed():
+            for rec in self._stream_search(file_info):
+                yield rec
+        elif not self.is_binary or self.process_binary:
+            for rec in self._search_content(file_info):
+                yield rec
 
     def run(self):
         """Start the file search."""
 
+        # Files are opened once and shared by encoding detection, searching, and decoding.
+        self.file_map = _FileMap(self.file_obj.name) if self.file_content is None else None
+
         try:
             if self.search_obj.is_replace():
                 for rec in self.search_and_replace():
@@ -1123,6 +2432,141 @@ class _FileSearch(object):
                 None,
                 get_exception()
             )
+        finally:
+            if self.file_map is not None:
+                self.file_map.close()
+
+
+class _GlobMatcher(object):
+    """
+    Match lowercase names against a list of lowercase glob patterns with one check.
+
+    Patterns that are just a literal suffix (`*.py`) are matched by a set lookup
+    on the name's extension, or `endswith` for multi-part suffixes (`*.tar.gz`).
+    All other patterns are translated and combined into a single regular expression.
+    """
+
+    def __init__(self, patterns):
+        """Initialize."""
+
+        self.match_all = False
+        self.extensions = set()
+        suffixes = []
+        globs = []
+        for p in patterns:
+            if p == '*':
+                self.match_all = True
+            elif p.startswith('*') and not RE_GLOB_SPECIAL.search(p[1:]):
+                suffix = p[1:]
+                if suffix.startswith('.') and suffix.count('.') == 1:
+                    self.extensions.add(suffix)
+                else:
+                    suffixes.append(suffix)
+            else:
+                globs.append(p)
+
+        self.suffixes = tuple(suffixes)
+        self.pattern = re.compile(
+            '|'.join('(?:%s)' % self._translate(p) for p in globs), re.DOTALL
+        ) if globs else None
+
+    def _translate(self, pattern):
+        """Translate a glob to a regular expression."""
+
+        pattern = fnmatch.translate(pattern)
+        # Python 2 appends global flags which can't be combined with other patterns.
+        if pattern.endswith('(?ms)'):  # pragma: no cover
+            pattern = pattern[:-5]
+        return pattern
+
+    def match(self, name):
+        """Check if the lowercase name matches any of the patterns."""
+
+        if self.match_all:
+            return True
+        if self.extensions:
+            index = name.rfind('.')
+            if index != -1 and name[index:] in self.extensions:
+                return True
+        if self.suffixes and name.endswith(self.suffixes):
+            return True
+        return self.pattern is not None and self.pattern.match(name) is not None
+
+
+class _GlobPatterns(object):
+    """A `|` separated list of glob patterns where patterns starting with `-` are negated."""
+
+    def __init__(self, string):
+        """Initialize."""
+
+        patterns = []
+        negated = []
+        for p in string.lower().split('|'):
+            if len(p) > 1 and p[0] == '-':
+                negated.append(p[1:])
+            else:
+                patterns.append(p)
+        self.patterns = _GlobMatcher(patterns)
+        self.negated = _GlobMatcher(negated)
+
+
+_WORKER = {}
+
+
+def _parallel_init(search_params, flags, context, encoding, backup_location, regex_mode, encoding_cache, abort=None):
+    """Initialize a worker process with the search settings shared by all files."""
+
+    _WORKER['args'] = (search_params, flags, context, encoding, backup_location, regex_mode)
+    _WORKER['abort'] = abort
+    _WORKER['pattern_cache'] = _PatternCache()
+    _WORKER['encoding_cache'] = None
+    if encoding_cache is not None:
+        # Detected encodings are returned to the main process to be cached.
+        _WORKER['encoding_cache'] = EncodingCache(encoding_cache, defer=True)
+        Finalize(None, _WORKER['encoding_cache'].close, exitpriority=10)
+
+
+def _parallel_search(task):
+    """Search a file in a worker process and return all of its records."""
+
+    file_info, file_id, max_count = task
+    search_params, flags, context, encoding, backup_location, regex_mode = _WORKER['args']
+
+    abort = _WORKER['abort']
+    if abort is not None and abort.is_set():
+        # Files still queued when a replace is aborted are left untouched.
+        return file_id, [], [], []
+
+    # Replaced files are renamed over their originals by the main process in its batches.
+    replace_batch = _ReplaceBatch()
+    try:
+        searcher = _FileSearch(
+            search_params,
+            file_info,
+            file_id,
+            flags,
+            context,
+            encoding,
+            backup_location,
+            max_count,
+            None,
+            regex_mode,
+            _WORKER['pattern_cache'],
+            _WORKER['encoding_cache'],
+            replace_batch
+        )
+        records = list(compact_records(searcher.run()))
+    except Exception:
+        records = [
+            FileRecord(
+                FileInfoRecord(file_id, file_info.name, None, None, None, None),
+                None,
+                get_exception()
+            )
+        ]
+    encoding_cache = _WORKER['encoding_cache']
+    encodings = encoding_cache.take_deferred() if encoding_cache is not None else []
+    return file_id, records, replace_batch.pending, encodings
 
 
 class _DirWalker(object):
@@ -1150,6 +2594,7 @@ class _DirWalker(object):
         self.folder_exclude = self._parse_pattern(folder_exclude, dir_regex_match)
         self.recursive = recursive
         self.show_hidden = show_hidden
+        self.win_attributes = util.platform() == "windows"
         self.backup2folder = backup_to_folder
         if backup_location:
             self.backup_ext = ('.%s' % backup_location.lower()) if not self.backup2folder else DEFAULT_BAK
@@ -1166,26 +2611,28 @@ class _DirWalker(object):
             if self.regex_mode == BREGEX_MODE:
                 pattern = bregex.compile_search(
                     string, bregex.IGNORECASE
-                ) if regex_match else [f.lower() for f in string.split("|")]
+                ) if regex_match else _GlobPatterns(string)
             elif self.regex_mode == REGEX_MODE:
                 pattern = regex.compile(
                     string, regex.IGNORECASE | regex.ASCII
-                ) if regex_match else [f.lower() for f in string.split("|")]
+                ) if regex_match else _GlobPatterns(string)
             elif self.regex_mode == BRE_MODE:
                 pattern = bre.compile_search(
                     string, bre.IGNORECASE | (bre.ASCII if util.PY3 else 0)
-                ) if regex_match else [f.lower() for f in string.split("|")]
+                ) if regex_match else _GlobPatterns(string)
             else:
                 pattern = re.compile(
                     string, re.IGNORECASE | (re.ASCII if util.PY3 else 0)
-                ) if regex_match else [f.lower() for f in string.split("|")]
+                ) if regex_match else _GlobPatterns(string)
         return pattern
 
-    def _is_hidden(self, path):
+    def _is_hidden(self, path, entry=None):
         """Check if file is hidden."""
 
         if not self.show_hidden:
-            return is_hidden(path)
+            # Windows provides the file attributes with the directory listing.
+            st = entry.stat(follow_symlinks=False) if entry is not None and self.win_attributes else None
+            return is_hidden(path, st)
         return False
 
     def _compare_value(self, limit_check, current):
@@ -1205,14 +2652,12 @@ class _DirWalker(object):
                 value_okay = True
         return value_okay
 
-    def _is_times_okay(self, pth):
+    def _is_times_okay(self):
         """Verify file times meet requirements."""
 
         times_okay = False
         mod_okay = False
         cre_okay = False
-        self.modified_time = getmtime(pth)
-        self.created_time = getctime(pth)
         if self.modified is None:
             mod_okay = True
         else:
@@ -1225,17 +2670,24 @@ class _DirWalker(object):
             times_okay = True
         return times_okay
 
-    def _is_size_okay(self, pth):
+    def _is_size_okay(self):
         """Verify file size meets requirements."""
 
         size_okay = False
-        self.current_size = os.path.getsize(pth)
         if self.size is None:
             size_okay = True
         else:
             size_okay = self._compare_value(self.size, self.current_size)
         return size_okay
 
+    def _stat_file(self, pth, entry=None):
+        """Get the file size and times from a single stat."""
+
+        st = entry.stat() if entry is not None else os.stat(pth)
+        self.current_size = st.st_size
+        self.modified_time = getstatmtime(st)
+        self.created_time = getstatctime(st)
+
     def _is_backup(self, name, directory=False):
         """Check if file or directory is a rumcore backup."""
 
@@ -1256,61 +2708,45 @@ class _DirWalker(object):
 
         return is_backup
 
-    def _valid_file(self, base, name):
+    def _valid_file(self, base, name, entry=None):
         """Return whether a file can be searched."""
 
         valid = False
         if (
             self.file_pattern is not None and
-            not self._is_hidden(os.path.join(base, name)) and
-            not self._is_backup(name)
+            not self._is_hidden(os.path.join(base, name), entry) and
+            not self._is_backup(name) and
+            not (name.startswith(TEMP_PREFIX) and name.endswith(TEMP_EXT))
         ):
             if self.file_regex_match:
                 valid = True if self.file_pattern.match(name) is not None else False
             else:
-                matched = False
-                exclude = False
-                for p in self.file_pattern:
-                    if len(p) > 1 and p[0] == "-":
-                        if fnmatch(name.lower(), p[1:]):
-                            exclude = True
-                            break
-                    elif fnmatch(name.lower(), p):
-                        matched = True
-                if exclude:
+                lower = name.lower()
+                if self.file_pattern.negated.match(lower):
                     valid = False
-                elif matched:
+                elif self.file_pattern.patterns.match(lower):
                     valid = True
             if valid:
-                valid = self._is_size_okay(os.path.join(base, name))
-            if valid:
-                valid = self._is_times_okay(os.path.join(base, name))
+                self._stat_file(os.path.join(base, name), entry)
+                valid = self._is_size_okay() and self._is_times_okay()
         return valid
 
-    def _valid_folder(self, base, name):
+    def _valid_folder(self, base, name, entry=None):
         """Return whether a folder can be searched."""
 
         valid = True
         if not self.recursive:
             valid = False
-        elif self._is_hidden(os.path.join(base, name)) or self._is_backup(name, True):
+        elif self._is_hidden(os.path.join(base, name), entry) or self._is_backup(name, True):
             valid = False
         elif self.folder_exclude is not None:
             if self.dir_regex_match:
                 valid = False if self.folder_exclude.match(name) is not None else True
             else:
-                matched = False
-                exclude = False
-                for p in self.folder_exclude:
-                    if len(p) > 1 and p[0] == "-":
-                        if fnmatch(name.lower(), p[1:]):
-                            matched = True
-                            break
-                    elif fnmatch(name.lower(), p):
-                        exclude = True
-                if matched:
+                lower = name.lower()
+                if self.folder_exclude.negated.match(lower):
                     valid = True
-                elif exclude:
+                elif self.folder_exclude.patterns.match(lower):
                     valid = False
         return valid
 
@@ -1319,19 +2755,44 @@ class _DirWalker(object):
 
         self.abort = True
 
+    def _scan(self, base):
+        """Get the folder and file entries of a directory."""
+
+        dirs = []
+        files = []
+        for entry in scandir(base):
+            try:
+                is_dir = entry.is_dir()
+            except OSError:  # pragma: no cover
+                is_dir = False
+            if is_dir:
+                dirs.append(entry)
+            else:
+                files.append(entry)
+        return dirs, files
+
     def walk(self):
         """Start search for valid files."""
 
-        for base, dirs, files in os.walk(self.dir):
+        stack = [self.dir]
+        while stack:
+            base = stack.pop()
+            try:
+                dirs, files = self._scan(base)
+            except OSError:
+                # Folders that can't be listed are skipped.
+                continue
+
             # Remove child folders based on exclude rules
-            for name in dirs[:]:
+            children = []
+            for entry in dirs:
                 try:
-                    if not self._valid_folder(base, name):
-                        dirs.remove(name)
+                    # Like os.walk, don't follow symlinks to folders.
+                    if self._valid_folder(base, entry.name, entry) and not entry.is_symlink():
+                        children.append(entry.path)
                 except Exception:  # pragma: no cover
-                    dirs.remove(name)
                     yield FileAttrRecord(
-                        os.path.join(base, name),
+                        os.path.join(base, entry.name),
                         None,
                         None,
                         None,
@@ -1341,40 +2802,43 @@ class _DirWalker(object):
                 if self.abort:
                     break
 
-            # Seach files if they were found
-            if len(files):
-                # Only search files that are in the inlcude rules
-                for name in files:
-                    try:
-                        valid = self._valid_file(base, name)
-                    except Exception:  # pragma: no cover
-                        valid = False
-                        yield FileAttrRecord(
-                            os.path.join(base, name),
-                            None,
-                            None,
-                            None,
-                            False,
-                            get_exception()
-                        )
-
-                    if valid:
-                        yield FileAttrRecord(
-                            os.path.join(base, name),
-                            self.current_size,
-                            self.modified_time,
-                            self.created_time,
-                            False,
-                            None
-                        )
-                    else:
-                        yield FileAttrRecord(os.path.join(base, name), None, None, None, True, None)
+            # Only search files that are in the inlcude rules
+            for entry in files:
+                name = entry.name
+                try:
+                    valid = self._valid_file(base, name, entry)
+                except Exception:  # pragma: no cover
+                    valid = False
+                    yield FileAttrRecord(
+                        os.path.join(base, name),
+                        None,
+                        None,
+                        None,
+                        False,
+                        get_exception()
+                    )
+
+                if valid:
+                    yield FileAttrRecord(
+                        os.path.join(base, name),
+                        self.current_size,
+                        self.modified_time,
+                        self.created_time,
+                        False,
+                        None
+                    )
+                else:
+                    yield FileAttrRecord(os.path.join(base, name), None, None, None, True, None)
+
+                if self.abort:
+                    break
 
-                    if self.abort:
-                        break
             if self.abort:
                 break
 
+            # Walk child folders top down in the order they were listed.
+            stack.extend(reversed(children))
+
     def run(self):
         """Run the directory walker."""
 
@@ -1391,9 +2855,22 @@ class Rummage(object):
     def __init__(
         self, target, searches, file_pattern=None, folder_exclude=None,
         flags=0, context=(0, 0), max_count=None, encoding=None, size=None,
-        modified=None, created=None, backup_location=None, regex_mode=RE_MODE
+        modified=None, created=None, backup_location=None, regex_mode=RE_MODE,
+        workers=1, ordered=False, queue_size=CRAWL_QUEUE_SIZE, encoding_cache=None
     ):
-        """Initialize Rummage object."""
+        """
+        Initialize Rummage object.
+
+        If `encoding_cache` is the path of a database file, detected file encodings are cached
+        in it and reused in later searches as long as the files are unchanged.
+
+        The directory is crawled in its own thread which can get up to `queue_size` files
+        ahead of the search.
+
+        Setting `workers` to a value greater than one searches the crawled files in a pool
+        of that many processes (zero uses one process per CPU).  Records are returned as
+        files finish unless `ordered` is set, in which case they are returned in crawl order.
+        """
 
         self.abort = False
         self.searcher = None
@@ -1403,8 +2880,14 @@ class Rummage(object):
         self.regex_mode = regex_mode
 
         self.search_params = searches
+        self.pattern_cache = _PatternCache()
+        self.encoding_cache_file = encoding_cache
+        self.encoding_cache = EncodingCache(encoding_cache) if encoding_cache is not None else None
 
         self.file_flags = flags & FILE_MASK
+        self.replace_batch = (
+            _ReplaceBatch() if searches.is_replace() and not bool(self.file_flags & BUFFER_INPUT) else None
+        )
         self.context = context
         self.encoding = self._verify_encoding(encoding) if encoding is not None else None
         self.skipped = 0
@@ -1427,6 +2910,23 @@ class Rummage(object):
         self.queue = deque()
         self.file_error = None
 
+        # Parallel search setup
+        self.workers = int(workers) if workers else multiprocessing.cpu_count()
+        self.ordered = ordered
+        self.pool = None
+        self.manager = None
+        self.parallel_abort = None
+        self.in_flight = 0
+        self.next_id = -1
+        self.next_ordered_id = 0
+        self.parallel_done = {}
+        self.parallel_results = queue.Queue()
+
+        # Directory crawl setup
+        self.crawl_queue = queue.Queue(max(int(queue_size), 1))
+        self.crawler = None
+        self.crawl_finished = False
+
         # Initialize search objects:
         # - _DirWalker for if target is a folder
         # - Append FileAttrRecord if target is a file or buffer
@@ -1506,7 +3006,8 @@ class Rummage(object):
 
     def get_status(self):
         """Return number of files searched out of current number of files crawled."""
-        return self.idx + 1, self.idx + 1 + len(self.files), self.skipped, self.records + 1
+        pending = len(self.files) + self.in_flight + self.crawl_queue.qsize()
+        return self.idx + 1, self.idx + 1 + pending, self.skipped, self.records + 1
 
     def kill(self):
         """Kill process."""
@@ -1516,6 +3017,25 @@ class Rummage(object):
             self.searcher.kill()
         if self.path_walker:
             self.path_walker.kill()
+        parallel_abort = self.parallel_abort
+        if parallel_abort is not None:
+            # Workers replacing files are left to finish them, but skip the files still queued.
+            parallel_abort.set()
+        elif self.pool:
+            self.pool.terminate()
+
+    def _is_parallel(self):
+        """Check if crawled files can be searched in worker processes."""
+
+        if self.workers < 2:
+            return False
+
+        try:
+            # Replace plugins that are loaded from a path can't be sent to a worker.
+            pickle.dumps(self.search_params)
+        except Exception:
+            return False
+        return True
 
     def _get_next_file(self):
         """Get the next file from the file crawler results."""
@@ -1557,7 +3077,10 @@ class Rummage(object):
                 self.backup_location,
                 self.max,
                 content_buffer,
-                self.regex_mode
+                self.regex_mode,
+                self.pattern_cache,
+                self.encoding_cache,
+                self.replace_batch
             )
             for rec in self.searcher.run():
                 if rec.error is None:
@@ -1569,43 +3092,269 @@ class Rummage(object):
                 if self.max is not None and self.max == 0:
                     self.kill()
 
+            for rec in self._replace_errors():
+                yield rec
+
+    def _replace_errors(self):
+        """Return records for replaced files that couldn't be renamed over their originals."""
+
+        if self.replace_batch is not None:
+            while self.replace_batch.errors:
+                name, error = self.replace_batch.errors.pop(0)
+                yield FileRecord(FileInfoRecord(None, name, None, None, None, None), None, error)
+
+    def _queue_crawled(self, record):
+        """Queue a crawled record, waiting for room unless the search is aborted."""
+
+        while not self.abort:
+            try:
+                self.crawl_queue.put(record, True, POLL_INTERVAL)
+                break
+            except queue.Full:
+                pass
+
+    def _crawl_worker(self):
+        """Crawl the directory in a thread and queue the results."""
+
+        try:
+            for f in self.path_walker.run():
+                self._queue_crawled(f)
+                if self.abort:
+                    break
+        finally:
+            # Signal the crawl is done.
+            self._queue_crawled(None)
+
+    def _start_crawl(self):
+        """Start crawling the directory."""
+
+        self.crawler = threading.Thread(target=self._crawl_worker)
+        self.crawler.daemon = True
+        self.crawler.start()
+
+    def _stop_crawl(self):
+        """Stop crawling the directory."""
+
+        if self.crawler is not None:
+            if not self.crawl_finished:
+                # The search was abandoned early, so stop the crawler.
+                self.kill()
+            self.crawler.join()
+            self.crawler = None
+
+    def _crawl(self, idle=False):
+        """
+        Get the crawled records as they become available.
+
+        If `idle` is enabled, `None` is returned when nothing has been crawled
+        within the poll interval so the caller can do other work.
+        """
+
+        while not self.abort:
+            try:
+                f = self.crawl_queue.get(True, POLL_INTERVAL)
+            except queue.Empty:
+                if idle:
+                    yield None
+                continue
+
+            if f is None:
+                self.crawl_finished = True
+                break
+            yield f
+
     def walk_files(self):
-        """Crawl the directory."""
+        """Crawl the directory and search the files as they are found."""
+
+        self._start_crawl()
+        try:
+            for f in self._crawl():
+                if hasattr(f, 'skipped') and f.skipped:
+                    self.idx += 1
+                    self.records += 1
+                    self.skipped += 1
+                    yield f
+                elif f.error:
+                    self.idx += 1
+                    self.records += 1
+                    yield f
+                else:
+                    self.files.append(f)
+                    for rec in self.search_file():
+                        yield rec
+        finally:
+            self._stop_crawl()
+
+    def _start_parallel(self):
+        """Start the worker processes."""
+
+        if self.replace_batch is not None:
+            # Replacing workers are told of an abort through a shared flag instead of being terminated.
+            self.manager = multiprocessing.Manager()
+            self.parallel_abort = self.manager.Event()
+        self.pool = multiprocessing.Pool(
+            self.workers,
+            _parallel_init,
+            (
+                self.search_params,
+                self.file_flags,
+                self.context,
+                self.encoding,
+                self.backup_location,
+                self.regex_mode,
+                self.encoding_cache_file,
+                self.parallel_abort
+            )
+        )
 
-        folder_limit = 100
+    def _stop_parallel(self):
+        """Stop the worker processes."""
 
-        for f in self.path_walker.run():
-            if hasattr(f, 'skipped') and f.skipped:
-                self.idx += 1
-                self.records += 1
-                self.skipped += 1
-                yield f
-            elif f.error:
-                self.idx += 1
-                self.records += 1
-                yield f
+        if self.pool is not None:
+            if self.abort and self.replace_batch is None:
+                self.pool.terminate()
             else:
-                self.files.append(f)
+                # A worker killed while replacing a file would leave a temporary file, and maybe
+                # a backup without the replacement, so replacing lets the files in progress finish.
+                self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+            # Files the workers finished replacing still need to be renamed.
+            while True:
+                try:
+                    self._apply_worker_writes(*self.parallel_results.get_nowait()[2:])
+                except queue.Empty:
+                    break
+
+            if self.manager is not None:
+                self.parallel_abort = None
+                self.manager.shutdown()
+                self.manager = None
+
+    def _apply_worker_writes(self, replaced, encodings):
+        """
+        Apply the writes of a file searched by a worker process.
+
+        The files it replaced are queued to be renamed over their originals,
+        and the encodings it detected are cached.
+        """
+
+        for temp_name, name, in_place in replaced:
+            self.replace_batch.add(temp_name, name, in_place)
+        if encodings and self.encoding_cache is not None:
+            self.encoding_cache.apply(encodings)
+
+    def _submit_file(self, file_info):
+        """Queue a file to be searched by the worker processes."""
+
+        self.next_id += 1
+        self.in_flight += 1
+        kwargs = {}
+        if util.PY3:
+            kwargs['error_callback'] = functools.partial(self._parallel_error, self.next_id)
+        self.pool.apply_async(
+            _parallel_search,
+            ((file_info, self.next_id, self.max),),
+            callback=self.parallel_results.put,
+            **kwargs
+        )
 
+    def _parallel_error(self, file_id, error):
+        """Queue an error a worker process failed with in place of the records of its file."""
+
+        try:
+            raise error
+        except Exception:
+            records = [ErrorRecord(get_exception())]
+        self.parallel_results.put((file_id, records, [], []))
+
+    def _parallel_file_records(self, records):
+        """Count and return the records of a file searched by a worker process."""
+
+        self.idx += 1
+        self.in_flight -= 1
+        for rec in expand_records(records):
             if self.abort:
-                self.files.clear()
+                break
+
+            if rec.error is None:
+                self.records += 1
+                if self.max is not None and rec.match is not None:
+                    self.max -= 1
+            yield rec
 
-            # Search 50 for every 100
-            if len(self.files) >= folder_limit:
+            if self.max is not None and self.max == 0:
+                self.kill()
 
-                for x in range(0, 50):
+        for rec in self._replace_errors():
+            yield rec
 
-                    for rec in self.search_file():
+    def _get_parallel_results(self, block=False):
+        """Return records of searched files, optionally waiting for at least one file to finish."""
+
+        while self.in_flight and not self.abort:
+            try:
+                file_id, records, replaced, encodings = self.parallel_results.get(block, POLL_INTERVAL)
+            except queue.Empty:
+                if block:
+                    continue
+                break
+            block = False
+            self._apply_worker_writes(replaced, encodings)
+
+            if self.ordered:
+                self.parallel_done[file_id] = records
+                while self.next_ordered_id in self.parallel_done and not self.abort:
+                    records = self.parallel_done.pop(self.next_ordered_id)
+                    self.next_ordered_id += 1
+                    for rec in self._parallel_file_records(records):
                         yield rec
+            else:
+                for rec in self._parallel_file_records(records):
+                    yield rec
 
-        # Clear files if kill was signalled.
-        if self.abort:
-            self.files.clear()
+    def walk_files_parallel(self):
+        """Crawl the directory and search the files in worker processes."""
 
-        # Finish searching the rest
-        while self.files and not self.abort:
-            for rec in self.search_file():
-                yield rec
+        limit = self.workers * PARALLEL_BACKLOG
+
+        self._start_crawl()
+        self._start_parallel()
+        try:
+            for f in self._crawl(idle=True):
+                if f is None:
+                    pass
+                elif hasattr(f, 'skipped') and f.skipped:
+                    self.idx += 1
+                    self.records += 1
+                    self.skipped += 1
+                    yield f
+                elif f.error:
+                    self.idx += 1
+                    self.records += 1
+                    yield f
+                elif not self.abort:
+                    self._submit_file(f)
+
+                if self.abort:
+                    break
+
+                # Keep a limited number of files queued for the workers.
+                while self.in_flight >= limit and not self.abort:
+                    for rec in self._get_parallel_results(True):
+                        yield rec
+
+                for rec in self._get_parallel_results():
+                    yield rec
+
+            # Finish searching the rest
+            while self.in_flight and not self.abort:
+                for rec in self._get_parallel_results(True):
+                    yield rec
+        finally:
+            self._stop_parallel()
+            self._stop_crawl()
 
     def find(self):
         """
@@ -1620,17 +3369,33 @@ class Rummage(object):
         self.skipped = 0
 
         if len(self.search_params):
-            if self.file_error is not None:
-                # Single target wasn't set up right; just return error.
-                yield self.file_error
-            elif len(self.files):
-                # Single target search (already set up); just search the file.
-                for result in self.search_file(self.target if self.buffer_input else None):
-                    yield result
-            else:
-                # Crawl directory and search files.
-                for result in self.walk_files():
-                    yield result
+            try:
+                if self.file_error is not None:
+                    # Single target wasn't set up right; just return error.
+                    yield self.file_error
+                elif len(self.files):
+                    # Single target search (already set up); just search the file.
+                    for result in self.search_file(self.target if self.buffer_input else None):
+                        yield result
+                elif self._is_parallel():
+                    # Crawl directory and search files in worker processes.
+                    for result in self.walk_files_parallel():
+                        yield result
+                else:
+                    # Crawl directory and search files.
+                    for result in self.walk_files():
+                        yield result
+
+                if self.replace_batch is not None:
+                    self.replace_batch.flush()
+                    for result in self._replace_errors():
+                        yield result
+            finally:
+                if self.replace_batch is not None:
+                    # Replace the files of an abandoned search that were already updated.
+                    self.replace_batch.flush()
+                if self.encoding_cache is not None:
+                    self.encoding_cache.close()
         else:
             # No search pattern, so just return files that *would* be searched.
             for f in self.path_walker.run():
@@ -1642,3 +3407,76 @@ class Rummage(object):
 
                 if self.abort:
                     self.files.clear()
+
+    def find_compact(self):
+        """
+        Find like `find`, but return the matches of each file as `FileMatchesRecord`s.
+
+        Use `expand_records` to get the records `find` would return.
+        """
+
+        for result in compact_records(self.find()):
+            yield result
+
+    def _queue_batched(self, results, record):
+        """Queue a found record, waiting for room unless the search is aborted."""
+
+        while not self.abort:
+            try:
+                results.put(record, True, POLL_INTERVAL)
+                break
+            except queue.Full:
+                pass
+
+    def _batch_worker(self, results):
+        """Find in a thread and queue the results."""
+
+        try:
+            for result in self.find():
+                self._queue_batched(results, result)
+                if self.abort:
+                    break
+        except Exception:
+            self._queue_batched(results, ErrorRecord(get_exception()))
+
+    def find_batches(self, max_items=BATCH_SIZE, max_latency_ms=BATCH_LATENCY):
+        """
+        Find like `find`, but return the records in lists along with a `get_status` snapshot.
+
+        The search runs in a thread, and a batch is returned once it holds `max_items`
+        records or `max_latency_ms` have passed since the last one, so a consumer handles
+        results and refreshes its display at a bounded rate. A batch may be empty if
+        only the status has changed.
+        """
+
+        max_items = max(max_items, 1)
+        latency = max_latency_ms / 1000.0
+        results = queue.Queue(max_items * 2)
+        worker = threading.Thread(target=self._batch_worker, args=(results,))
+        worker.daemon = True
+        worker.start()
+
+        batch = []
+        status = None
+        deadline = time.time() + latency
+        try:
+            done = False
+            while not done:
+                try:
+                    batch.append(results.get(True, max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    # The worker may finish between the timeout and the check, so look once more.
+                    done = not worker.is_alive() and results.empty()
+
+                if done or len(batch) >= max_items or time.time() >= deadline:
+                    current = self.get_status()
+                    if batch or current != status:
+                        status = current
+                        yield batch, status
+                        batch = []
+                    deadline = time.time() + latency
+        finally:
+            if worker.is_alive():
+                # The batches were abandoned early, so stop the search.
+                self.kill()
+            worker.join()
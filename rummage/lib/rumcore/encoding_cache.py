@@ -0,0 +1,163 @@
+"""
+Encoding cache.
+
+Licensed under MIT
+Copyright (c) 2013 - 2015 Isaac Muse <isaacmuse@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions
+of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+IN THE SOFTWARE.
+"""
+from __future__ import unicode_literals
+import sqlite3
+from .text_decode import Encoding
+
+# Writes to accumulate before committing them
+COMMIT_LIMIT = 100
+
+# Seconds to wait on a database locked by another search
+TIMEOUT = 5.0
+
+
+def _get_key(st):
+    """Get the size, modified time (in nanoseconds), and inode of a stat result."""
+
+    mtime = getattr(st, 'st_mtime_ns', None)
+    if mtime is None:  # pragma: no cover
+        mtime = int(st.st_mtime * 1000000000)
+    return st.st_size, mtime, st.st_ino
+
+
+class EncodingCache(object):
+    """
+    Persistent cache of detected file encodings.
+
+    Entries are looked up by path and are only valid while the file's size,
+    modified time, and inode are unchanged; stale entries are dropped.
+
+    The cache is a convenience, so database failures are ignored and
+    simply cause the encoding to be detected again.
+
+    If `defer` is enabled, the cache only reads the database, and its writes are
+    kept in `deferred` to be applied by another cache.  Worker processes defer
+    their writes to the main process, so they never wait on each other's locks.
+    """
+
+    def __init__(self, filename, defer=False):
+        """Initialize."""
+
+        self.filename = filename
+        self.defer = defer
+        self.deferred = []
+        self.conn = None
+        self.pending = 0
+
+    def _connect(self):
+        """Get the database connection."""
+
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.filename, timeout=TIMEOUT, check_same_thread=False)
+            # This is a cache, so durability is not a concern.
+            self.conn.execute('PRAGMA synchronous = OFF')
+            # Readers and the writer don't block each other with a write-ahead log.
+            try:
+                self.conn.execute('PRAGMA journal_mode = WAL')
+            except sqlite3.Error:  # pragma: no cover
+                pass
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS encodings ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, inode INTEGER, encode TEXT, bom BLOB'
+                ')'
+            )
+        return self.conn
+
+    def _written(self):
+        """Track a write and commit if enough have accumulated."""
+
+        self.pending += 1
+        if self.pending >= COMMIT_LIMIT:
+            self.commit()
+
+    def get(self, path, st):
+        """Get the cached encoding for the file if the cached entry is still valid."""
+
+        encoding = None
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                'SELECT size, mtime, inode, encode, bom FROM encodings WHERE path = ?', (path,)
+            ).fetchone()
+            if row is not None:
+                if tuple(row[:3]) == _get_key(st):
+                    encoding = Encoding(row[3], bytes(row[4]) if row[4] is not None else None)
+                elif not self.defer:
+                    conn.execute('DELETE FROM encodings WHERE path = ?', (path,))
+                    self._written()
+        except sqlite3.Error:
+            pass
+        return encoding
+
+    def set(self, path, st, encoding):
+        """Cache the encoding of the file."""
+
+        if self.defer:
+            self.deferred.append((path, _get_key(st), encoding))
+        else:
+            self._set(path, _get_key(st), encoding)
+
+    def take_deferred(self):
+        """Return the deferred writes and clear them."""
+
+        deferred = self.deferred
+        self.deferred = []
+        return deferred
+
+    def apply(self, deferred):
+        """Apply writes deferred by another cache."""
+
+        for path, key, encoding in deferred:
+            self._set(path, key, encoding)
+
+    def _set(self, path, key, encoding):
+        """Write the encoding of the file with the given stat key."""
+
+        try:
+            size, mtime, inode = key
+            self._connect().execute(
+                'INSERT OR REPLACE INTO encodings (path, size, mtime, inode, encode, bom) VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    path, size, mtime, inode, encoding.encode,
+                    sqlite3.Binary(encoding.bom) if encoding.bom is not None else None
+                )
+            )
+            self._written()
+        except sqlite3.Error:
+            pass
+
+    def commit(self):
+        """Commit pending writes."""
+
+        if self.conn is not None and self.pending:
+            try:
+                self.conn.commit()
+            except sqlite3.Error:
+                pass
+            self.pending = 0
+
+    def close(self):
+        """Commit pending writes and close the database."""
+
+        if self.conn is not None:
+            self.commit()
+            self.conn.close()
+            self.conn = None
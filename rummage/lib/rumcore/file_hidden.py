@@ -19,11 +19,14 @@ def platform_not_implemented(path):
 
 
 if util.platform() == "windows":
-    def is_win_hidden(path):
-        """Check if hidden for Windows."""
+    def is_win_hidden(path, st=None):
+        """Check if hidden for Windows (use the file attributes of `st` if provided)."""
 
         f = basename(path)
-        attrs = ctypes.windll.kernel32.GetFileAttributesW(path)
+        if st is not None and hasattr(st, 'st_file_attributes'):
+            attrs = st.st_file_attributes
+        else:
+            attrs = ctypes.windll.kernel32.GetFileAttributesW(path)
         return (attrs != -1 and bool(attrs & 2)) or (f.startswith('.') and f != "..")
 else:
     is_win_hidden = platform_not_implemented
@@ -117,12 +120,16 @@ if util.platform() != "osx":
     is_osx_hidden = platform_not_implemented
 
 
-def is_hidden(path):
-    """Return if file is hidden based on platform rules."""
+def is_hidden(path, st=None):
+    """
+    Return if file is hidden based on platform rules.
+
+    On Windows, a stat result from `os.scandir` can be provided to avoid querying the file attributes again.
+    """
 
     platform = util.platform()
     if platform == "windows":
-        return is_win_hidden(path)
+        return is_win_hidden(path, st)
     elif platform == "osx":
         if is_nix_hidden(path):
             return True
@@ -44,14 +44,30 @@ if util.platform() == "osx":
             raise OSError("Couldn't stat file %r" % pth)
         return buf.st_birthtimespec.tv_sec
 
+    def getstatctime(st):
+        """Get the appropriate creation time from a stat result on OSX."""
+
+        return int(st.st_birthtime)
+
 else:
     def getctime(pth):
         """Get the creation time for everyone else."""
 
         return os.path.getctime(pth)
 
+    def getstatctime(st):
+        """Get the creation time from a stat result for everyone else."""
+
+        return st.st_ctime
+
 
 def getmtime(pth):
     """Get modified time for everyone (this is just a wrapper)."""
 
     return os.path.getmtime(pth)
+
+
+def getstatmtime(st):
+    """Get modified time from a stat result for everyone."""
+
+    return st.st_mtime
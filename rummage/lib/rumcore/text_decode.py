@@ -37,6 +37,9 @@ DetectEncoding = UniversalDetector
 MAX_GUESS_SIZE = 31457280
 MIN_GUESS_SIZE = 512
 
+# 1 MB: how much of a very large file is sampled when guessing its encoding
+SAMPLE_GUESS_SIZE = 1048576
+
 MIN_CONFIDENCE = 0.5
 
 CONFIDENCE_MAP = {
@@ -214,48 +217,57 @@ def has_bom(content):
     return bom
 
 
-def _detect_encoding(f, ext, file_size):
-    """Guess using chardet and using memory map."""
+def _detect_map_encoding(m, ext, file_size, limit=None):
+    """Guess using chardet and a memory map (`limit` caps the bytes given to chardet)."""
 
     encoding = None
-    with contextlib.closing(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) as m:
-        # Check for boms
-        encoding = has_bom(m.read(4))
+    # Check for boms
+    m.seek(0)
+    encoding = has_bom(m.read(4))
+    m.seek(0)
+    # Check start of file if there is a high likely hood of being a binary file.
+    if encoding is None and _is_binary(m.read(1024)):
+        encoding = Encoding('bin', None)
+    m.seek(0)
+    # Check file extensions
+    if encoding is None:
+        encoding = _special_encode_check(m, ext)
+    # If content is very small, let's try and do a a utf-8 and ascii check
+    # before giving it to chardet.  Chardet doesn't work well on small buffers.
+    if encoding is None and _is_very_small(file_size):
+        encoding = _simple_detect(m)
+    # Well, we tried everything else, lets give it to chardet and cross our fingers.
+    if encoding is None:
+        enc = None
+        conf = None
+        detector = DetectEncoding()
         m.seek(0)
-        # Check start of file if there is a high likely hood of being a binary file.
-        if encoding is None and _is_binary(m.read(1024)):
+        for chunk in iter(functools.partial(m.read, 4096), b""):
+            detector.feed(chunk)
+            if detector.done or (limit is not None and m.tell() >= limit):
+                break
+        result = detector.close()
+
+        if result is not None:
+            enc = result['encoding']
+            conf = result['confidence']
+
+        if enc is not None and conf >= CONFIDENCE_MAP.get(enc, MIN_CONFIDENCE):
+            encoding = Encoding(
+                enc,
+                None
+            )
+        else:
             encoding = Encoding('bin', None)
-        m.seek(0)
-        # Check file extensions
-        if encoding is None:
-            encoding = _special_encode_check(m, ext)
-        # If content is very small, let's try and do a a utf-8 and ascii check
-        # before giving it to chardet.  Chardet doesn't work well on small buffers.
-        if encoding is None and _is_very_small(file_size):
-            encoding = _simple_detect(m)
-        # Well, we tried everything else, lets give it to chardet and cross our fingers.
-        if encoding is None:
-            enc = None
-            conf = None
-            detector = DetectEncoding()
-            m.seek(0)
-            for chunk in iter(functools.partial(f.read, 4096), b""):
-                detector.feed(chunk)
-                if detector.done:
-                    break
-            result = detector.close()
-
-            if result is not None:
-                enc = result['encoding']
-                conf = result['confidence']
-
-            if enc is not None and conf >= CONFIDENCE_MAP.get(enc, MIN_CONFIDENCE):
-                encoding = Encoding(
-                    enc,
-                    None
-                )
-            else:
-                encoding = Encoding('bin', None)
+    m.seek(0)
+    return encoding
+
+
+def _detect_encoding(f, ext, file_size):
+    """Guess using chardet and using memory map."""
+
+    with contextlib.closing(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) as m:
+        encoding = _detect_map_encoding(m, ext, file_size)
     return encoding
 
 
@@ -308,6 +320,46 @@ def inspect_bom(filename):
     return encoding
 
 
+def mguess(m, filename, verify=True, verify_blocks=1, verify_block_size=4096, sample_large=False):
+    """
+    Guess the encoding of an already memory mapped file.
+
+    `m` can be `None` for an empty file as empty files can't be memory mapped.
+    The file name is only used to check the extension.
+
+    Very large files are treated as binary unless `sample_large` is enabled,
+    in which case the encoding is guessed from the start of the file.
+    """
+
+    encoding = None
+
+    try:
+        ext = os.path.splitext(filename)[1].lower()
+        file_size = len(m) if m is not None else 0
+        # If the file is really big, lets just call it binary (or guess from a sample).
+        # We dont' have time to let Python chug through a massive file.
+        if sample_large and _is_very_large(file_size):
+            encoding = _detect_map_encoding(m, ext, file_size, SAMPLE_GUESS_SIZE)
+        elif not _is_very_large(file_size):
+            if file_size == 0:
+                encoding = Encoding('ascii', None)
+            else:
+                encoding = _detect_map_encoding(m, ext, file_size)
+
+                if verify and encoding.encode != 'bin':
+                    if not verify_encode(m, encoding.encode, verify_blocks, verify_block_size):
+                        encoding = Encoding('bin', None)
+                    m.seek(0)
+        else:
+            encoding = Encoding('bin', None)
+    except Exception:  # pragma: no cover
+        # print(traceback.format_exc())
+        pass
+
+    # If something went wrong, we will just return 'None'
+    return encoding
+
+
 def guess(filename, verify=True, verify_blocks=1, verify_block_size=4096):
     """Guess the encoding and decode the content of the file."""
 
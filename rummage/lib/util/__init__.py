@@ -20,11 +20,13 @@ if PY3:
     string_type = str
     ustr = str
     bstr = bytes
+    uchr = chr
     CommonBrokenPipeError = BrokenPipeError  # noqa F821
 else:
     string_type = basestring  # noqa F821
     ustr = unicode  # noqa F821
     bstr = str  # noqa F821
+    uchr = unichr  # noqa F821
 
     class CommonBrokenPipeError(Exception):
         """
@@ -67,6 +67,7 @@ setup(
         "chardet>=3.0.4",
         "backrefs>=1.0.1",
         "regex",
+        'scandir;python_version<"3.5"',
         "wxpython>=4.0.0a3"
     ],
     zip_safe=False,
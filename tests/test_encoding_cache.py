@@ -0,0 +1,101 @@
+"""Tests for encoding_cache.py."""
+from __future__ import unicode_literals
+import unittest
+import mock
+import codecs
+import os
+import shutil
+import tempfile
+from rummage.lib import rumcore as rc
+from rummage.lib.rumcore import encoding_cache
+from rummage.lib.rumcore import text_decode
+
+
+class TestEncodingCache(unittest.TestCase):
+    """Test the encoding cache."""
+
+    def setUp(self):
+        """Setup the tests."""
+
+        self.folder = tempfile.mkdtemp()
+        self.db = os.path.join(self.folder, 'encoding.db')
+        self.file = os.path.join(self.folder, 'test.txt')
+        with open(self.file, 'wb') as f:
+            f.write(codecs.BOM_UTF8 + 'search'.encode('utf-8'))
+
+    def tearDown(self):
+        """Cleanup."""
+
+        shutil.rmtree(self.folder)
+
+    def test_cache(self):
+        """Test caching and retrieving an encoding."""
+
+        cache = encoding_cache.EncodingCache(self.db)
+        st = os.stat(self.file)
+        self.assertIsNone(cache.get(self.file, st))
+        cache.set(self.file, st, text_decode.Encoding('utf-8', codecs.BOM_UTF8))
+        cache.close()
+
+        cache = encoding_cache.EncodingCache(self.db)
+        self.assertEqual(cache.get(self.file, st), text_decode.Encoding('utf-8', codecs.BOM_UTF8))
+        cache.close()
+
+    def test_stale(self):
+        """Test that an entry is dropped when the file changes."""
+
+        cache = encoding_cache.EncodingCache(self.db)
+        st = os.stat(self.file)
+        cache.set(self.file, st, text_decode.Encoding('ascii', None))
+
+        with open(self.file, 'ab') as f:
+            f.write(b'more')
+        st = os.stat(self.file)
+        self.assertIsNone(cache.get(self.file, st))
+
+        cache.set(self.file, st, text_decode.Encoding('utf-8', None))
+        self.assertEqual(cache.get(self.file, st), text_decode.Encoding('utf-8', None))
+        cache.close()
+
+    def test_search(self):
+        """Test that a search only guesses the encoding of an unchanged file once."""
+
+        search_params = rc.Search()
+        search_params.add('search', None, rc.LITERAL)
+
+        with mock.patch('rummage.lib.rumcore.text_decode.mguess', wraps=text_decode.mguess) as mock_guess:
+            for x in range(2):
+                rummage = rc.Rummage(self.folder, search_params, '*.txt', encoding_cache=self.db)
+                results = [r for r in rummage.find() if hasattr(r, 'match') and r.match is not None]
+                self.assertEqual(len(results), 1)
+                self.assertEqual(results[0].info.encoding, 'UTF-8')
+            self.assertEqual(mock_guess.call_count, 1)
+
+    def test_deferred(self):
+        """Test that a deferring cache leaves its writes to another cache."""
+
+        st = os.stat(self.file)
+        deferring = encoding_cache.EncodingCache(self.db, defer=True)
+        deferring.set(self.file, st, text_decode.Encoding('utf-8', codecs.BOM_UTF8))
+        self.assertIsNone(deferring.get(self.file, st))
+
+        cache = encoding_cache.EncodingCache(self.db)
+        cache.apply(deferring.take_deferred())
+        cache.close()
+        self.assertEqual(deferring.take_deferred(), [])
+        self.assertEqual(deferring.get(self.file, st), text_decode.Encoding('utf-8', codecs.BOM_UTF8))
+        deferring.close()
+
+    def test_parallel_search(self):
+        """Test that encodings detected by worker processes are cached by the main process."""
+
+        search_params = rc.Search()
+        search_params.add('search', None, rc.LITERAL)
+
+        rummage = rc.Rummage(self.folder, search_params, '*.txt', encoding_cache=self.db, workers=2)
+        results = [r for r in rummage.find() if hasattr(r, 'match') and r.match is not None]
+        self.assertEqual(len(results), 1)
+
+        cache = encoding_cache.EncodingCache(self.db)
+        self.assertEqual(cache.get(self.file, os.stat(self.file)), text_decode.Encoding('utf-8', codecs.BOM_UTF8))
+        cache.close()
@@ -1,13 +1,18 @@
 """Tests for rumcore."""
 from __future__ import unicode_literals
 import unittest
+import mock
+import multiprocessing.pool
 import os
+import pickle
 import re
 import regex
+import shutil
 import codecs
 import datetime
 import tempfile
 import textwrap
+import threading
 from backrefs import bre
 from backrefs import bregex
 from rummage.lib import rumcore as rc
@@ -16,6 +21,12 @@ from rummage.lib.util import epoch_timestamp as epoch
 from rummage.lib.rumcore import text_decode as td
 
 
+def _fail_search(task):
+    """Fail to search a file in a worker process."""
+
+    raise RuntimeError('failed')
+
+
 class TestHelperFunctions(unittest.TestCase):
     """Test helper functions."""
 
@@ -221,6 +232,155 @@ class TestHelperFunctions(unittest.TestCase):
         self.assertTrue(error[0].startswith('TypeError'))
 
 
+class TestPatternCache(unittest.TestCase):
+    """Tests for _PatternCache."""
+
+    def test_reuse(self):
+        """Test that a search entry is only compiled once."""
+
+        cache = rc._PatternCache()
+        pattern, replace, expand, literal = cache.get(r'search(\d)', r'replace\1', 0, False, rc.RE_MODE)
+        pattern2, replace2, expand2, literal2 = cache.get(r'search(\d)', r'replace\1', 0, False, rc.RE_MODE)
+        self.assertTrue(pattern is pattern2)
+        self.assertTrue(expand is expand2)
+        self.assertFalse(literal)
+        self.assertEqual(expand(pattern.search('search1')), 'replace1')
+
+        bin_pattern = cache.get(r'search(\d)', r'replace\1', 0, True, rc.RE_MODE)[0]
+        self.assertFalse(bin_pattern is pattern)
+        self.assertEqual(bin_pattern.pattern, b'search(\\d)')
+
+    def test_bounded(self):
+        """Test that the cache does not grow beyond its limit."""
+
+        cache = rc._PatternCache(2)
+        cache.get('a', None, rc.LITERAL, False, rc.RE_MODE)
+        cache.get('b', None, rc.LITERAL, False, rc.RE_MODE)
+        cache.get('a', None, rc.LITERAL, False, rc.RE_MODE)
+        cache.get('c', None, rc.LITERAL, False, rc.RE_MODE)
+        self.assertEqual([k[0] for k in cache._cache], ['a', 'c'])
+
+    def test_literals(self):
+        """Test finding the literals that a search pattern requires."""
+
+        cache = rc._PatternCache()
+        self.assertEqual(cache.get_literals('a.b', rc.LITERAL, rc.RE_MODE), ['a.b'])
+        self.assertEqual(cache.get_literals(r'def\s+(test\w*)ing', 0, rc.RE_MODE), ['test', 'def', 'ing'])
+        self.assertEqual(cache.get_literals(r'x(?:abc)+y?z', 0, rc.RE_MODE), ['abc', 'x', 'z'])
+        self.assertIsNone(cache.get_literals(r'test', rc.IGNORECASE, rc.RE_MODE))
+        self.assertIsNone(cache.get_literals(r'(?i)test', 0, rc.RE_MODE))
+        self.assertIsNone(cache.get_literals(r'foo|bar', 0, rc.RE_MODE))
+        self.assertIsNone(cache.get_literals(r'(?:test)*', 0, rc.RE_MODE))
+        self.assertIsNone(cache.get_literals(r'test', 0, rc.BRE_MODE))
+        self.assertEqual(cache.get_literals(r'test', rc.LITERAL, rc.BRE_MODE), ['test'])
+
+    def test_passes(self):
+        """Test combining search entries into the patterns a file is scanned with."""
+
+        search_params = rc.Search()
+        search_params.add('search1', None, rc.LITERAL)
+        search_params.add(r'search[2]', None, 0)
+        search_params.add(r'(\w)\1', None, 0)
+        search_params.add(r'(?i)search', None, 0)
+        search_params.add('search3', None, rc.LITERAL | rc.IGNORECASE)
+        search_params.add('search4', None, rc.LITERAL)
+
+        cache = rc._PatternCache()
+        passes = cache.get_passes(search_params, False, rc.RE_MODE)
+        self.assertTrue(passes is cache.get_passes(search_params, False, rc.RE_MODE))
+        self.assertEqual([p.get_entries() for p in passes], [[0, 5], [1], [2], [3], [4]])
+        self.assertEqual(
+            [passes[0].get_entry(m) for m in passes[0].pattern.finditer('search4 search2 search1')], [5, 0]
+        )
+
+        bin_passes = cache.get_passes(search_params, True, rc.RE_MODE)
+        self.assertEqual([p.get_entries() for p in bin_passes], [[0, 5], [1], [2], [3], [4]])
+        self.assertEqual(
+            [m.group(0) for m in bin_passes[0].pattern.finditer(b'search4 search1')], [b'search4', b'search1']
+        )
+
+        passes = cache.get_passes(search_params, False, rc.BRE_MODE)
+        self.assertEqual([p.get_entries() for p in passes], [[0, 5], [1], [2], [3], [4]])
+
+    def test_literal_set(self):
+        """Test scanning for many literal search entries at once."""
+
+        search_params = rc.Search()
+        for literal in ('key', 'value', 'a.b', 'KEY', 'keys', 'key'):
+            search_params.add(literal, None, rc.LITERAL | rc.IGNORECASE)
+
+        cache = rc._PatternCache()
+        for binary in (False, True):
+            # Literals whose matches could overlap are searched for in separate passes.
+            passes = cache.get_passes(search_params, binary, rc.RE_MODE)
+            self.assertEqual([p.get_entries() for p in passes], [[0, 1, 2], [3], [4], [5]])
+
+            text = 'Keys vaLue KEY a.b axb'
+            if binary:
+                text = text.encode('ascii')
+            matches = [(m.group(0), passes[0].get_entry(m)) for m in passes[0].pattern.finditer(text)]
+            if binary:
+                matches = [(m.decode('ascii'), entry) for m, entry in matches]
+            self.assertEqual(matches, [('Key', 0), ('vaLue', 1), ('KEY', 0), ('a.b', 2)])
+
+    def test_literal_set_non_ascii(self):
+        """Test that non-ASCII literals are only case folded when Unicode is enabled."""
+
+        for flags, expected in ((0, [('É', 0), ('x', 1)]), (rc.UNICODE, [('É', 0), ('x', 1), ('é', 0)])):
+            search_params = rc.Search()
+            search_params.add('É', None, rc.LITERAL | rc.IGNORECASE | flags)
+            search_params.add('x', None, rc.LITERAL | rc.IGNORECASE | flags)
+
+            passes = rc._PatternCache().get_passes(search_params, False, rc.RE_MODE)
+            # Non-ASCII literals are not combined when Unicode case folding is enabled.
+            self.assertEqual(len(passes), 2 if flags else 1)
+            matches = sorted(
+                (m.start(), m.group(0), p.get_entry(m)) for p in passes for m in p.pattern.finditer('É x é')
+            )
+            self.assertEqual([m[1:] for m in matches], expected)
+
+    def test_literal_set_prefix(self):
+        """Test that duplicate literals and literals that are prefixes of others are all reported."""
+
+        search_params = rc.Search()
+        for literal in ('key', 'keys', 'key', 'k', 'ey'):
+            search_params.add(literal, None, rc.LITERAL | rc.IGNORECASE | rc.UNICODE)
+
+        text = 'keys \u212aey KEY'
+        passes = rc._PatternCache().get_passes(search_params, False, rc.RE_MODE)
+        matches = sorted((p.get_entry(m), m.start()) for p in passes for m in p.pattern.finditer(text))
+        expected = sorted(
+            (idx, m.start())
+            for idx, literal in enumerate(('key', 'keys', 'key', 'k', 'ey'))
+            for m in re.finditer(re.escape(literal), text, re.IGNORECASE | re.UNICODE)
+        )
+        self.assertEqual(matches, expected)
+
+    def test_replace_steps(self):
+        """Test applying literal replace entries in one step."""
+
+        search_params = rc.Search(True)
+        search_params.add('foo', 'xyz', rc.LITERAL)
+        search_params.add('bar', '123', rc.LITERAL)
+        search_params.add('1', 'one', rc.LITERAL)
+        search_params.add('two', 'three', rc.LITERAL | rc.IGNORECASE)
+        search_params.add('abc', 'def', rc.LITERAL)
+        search_params.add('cab', 'ghi', rc.LITERAL)
+
+        cache = rc._PatternCache()
+        steps = cache.get_replace_steps(search_params, False, rc.RE_MODE)
+        self.assertEqual([s.entries for s in steps], [(0, 1), (2,), (3,), (4,), (5,)])
+        self.assertEqual(
+            [steps[0].replacements[m.group(0)] for m in steps[0].pattern.finditer('bar foo')], [(1, '123'), (0, 'xyz')]
+        )
+
+    def test_binary_unicode(self):
+        """Test that Unicode in a binary search pattern fails."""
+
+        cache = rc._PatternCache()
+        self.assertRaises(rc.RummageException, cache.get, 'Ā', None, 0, True, rc.RE_MODE)
+
+
 class TestRummageFileContent(unittest.TestCase):
     """Tests for _RummageFileContent."""
 
@@ -325,6 +485,61 @@ class TestRummageFileContent(unittest.TestCase):
         self.assertEqual(rfc.encoding.encode, 'bin')
         self.assertEqual(text, text2)
 
+    def test_shared_file_map(self):
+        """Test that a shared file map is opened once and reused."""
+
+        encoding = td.Encoding('utf-8', codecs.BOM_UTF8)
+        name = "tests/encodings/utf8_bom.txt"
+        file_map = rc._FileMap(name)
+        m = file_map.open()
+        self.assertEqual(file_map.stat().st_size, os.path.getsize(name))
+        rfc = rc._RummageFileContent(name, os.path.getsize(name), encoding, file_map=file_map)
+        with rfc as f:
+            text = f[:]
+        with codecs.open(name, 'r', encoding='utf-8-sig') as f:
+            text2 = f.read()
+        self.assertIs(file_map.open(), m)
+        self.assertEqual(text, text2)
+        file_map.close()
+
+    def test_empty_file_map(self):
+        """Test that an empty file is not mapped."""
+
+        encoding = td.Encoding('bin', None)
+        name = "tests/encodings/zero_size.txt"
+        rfc = rc._RummageFileContent(name, os.path.getsize(name), encoding)
+        with rfc as f:
+            text = f[:]
+        self.assertEqual(text, b'')
+
+
+class TestGlobPatterns(unittest.TestCase):
+    """Test the compiled glob patterns."""
+
+    def test_patterns(self):
+        """Test extension, suffix, and glob patterns."""
+
+        patterns = rc._GlobPatterns('*.PY|*.tar.gz|test_?.txt|-*_skip.py')
+
+        self.assertEqual(patterns.patterns.extensions, set(['.py']))
+        self.assertEqual(patterns.patterns.suffixes, ('.tar.gz',))
+        self.assertTrue(patterns.patterns.match('file.py'))
+        self.assertTrue(patterns.patterns.match('.py'))
+        self.assertTrue(patterns.patterns.match('file.tar.gz'))
+        self.assertTrue(patterns.patterns.match('test_a.txt'))
+        self.assertFalse(patterns.patterns.match('test_ab.txt'))
+        self.assertFalse(patterns.patterns.match('file.pyc'))
+        self.assertTrue(patterns.negated.match('file_skip.py'))
+        self.assertFalse(patterns.negated.match('file.py'))
+
+    def test_match_all(self):
+        """Test matching all files."""
+
+        patterns = rc._GlobPatterns('*|-')
+        self.assertTrue(patterns.patterns.match('file'))
+        self.assertTrue(patterns.patterns.match('-'))
+        self.assertFalse(patterns.negated.match('file'))
+
 
 class TestDirWalker(unittest.TestCase):
     """Test the _DirWalker class."""
@@ -823,6 +1038,218 @@ class TestFileSearch(unittest.TestCase):
             None
         )
 
+    def test_line_ending(self):
+        """Test line ending detection and line map creation."""
+
+        fs = rc._FileSearch(rc.Search(), None, 0, 0, (0, 0), None, None, None)
+
+        ending, line_map = fs._get_line_ending('test')
+        self.assertEqual((ending, list(line_map)), ('\n', []))
+        ending, line_map = fs._get_line_ending('a\nb\r\nc\n')
+        self.assertEqual((ending, list(line_map)), ('\n', [1, 4, 6]))
+        ending, line_map = fs._get_line_ending('a\r\nb\rc\r\n')
+        self.assertEqual((ending, list(line_map)), ('\n', [2, 7]))
+        ending, line_map = fs._get_line_ending('a\rb\nc\r\r')
+        self.assertEqual((ending, list(line_map)), ('\r', [1, 5, 6]))
+
+        fs.is_binary = True
+        ending, line_map = fs._get_line_ending(b'a\rb\r')
+        self.assertEqual((ending, list(line_map)), (b'\r', [1, 3]))
+
+        self.assertEqual(fs._get_row(0, line_map), 1)
+        self.assertEqual(fs._get_row(1, line_map), 1)
+        self.assertEqual(fs._get_row(2, line_map), 2)
+        self.assertEqual(fs._get_row(4, line_map), 3)
+
+    def test_lazy_line_map(self):
+        """Test that the line map is only indexed as far as needed."""
+
+        line_map = rc._LineMap('a\nb\nc\nd\ne\n')
+        self.assertEqual(line_map.line_ending, '\n')
+        self.assertEqual(list(line_map.offsets), [])
+
+        line_map.index(2, 1)
+        self.assertEqual(list(line_map.offsets), [1, 3, 5])
+        self.assertFalse(line_map.complete)
+
+        line_map.index(0)
+        self.assertEqual(list(line_map.offsets), [1, 3, 5])
+
+        line_map.index_all()
+        self.assertEqual(list(line_map.offsets), [1, 3, 5, 7, 9])
+        self.assertTrue(line_map.complete)
+
+    def test_prefilter(self):
+        """Test that files without the required literals are not decoded."""
+
+        name = 'tests/searches/searches_unix_ending.txt'
+        for pattern, matches, decoded in (
+            (r'search1', 2, 1),
+            (r'search\d\s*nowhere', 0, 0),
+            (r'not_(here|there)', 0, 0),
+            (r'nowhere|search2', 2, 1)
+        ):
+            search_params = rc.Search()
+            search_params.add(pattern, None, 0)
+            fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, (0, 0), None, None, None)
+            with mock.patch('rummage.lib.rumcore._RummageFileContent', wraps=rc._RummageFileContent) as mock_read:
+                results = [r for r in fs.run()]
+                self.assertEqual(len([r for r in results if r.match is not None]), matches)
+                self.assertEqual(mock_read.call_count, decoded)
+
+    def test_chain(self):
+        """Test that every entry of a search chain finds the matches it finds on its own."""
+
+        folder = tempfile.mkdtemp()
+        try:
+            name = os.path.join(folder, 'test.txt')
+            with open(name, 'wb') as f:
+                f.write(b'foo bar\nfoobar key keys search1 search2\n')
+
+            for chain, flags in (
+                ((r'\w+', 'bar'), 0), (('foo', 'oo'), 0), (('foo', 'oo'), rc.LITERAL),
+                (('key', 'keys'), rc.LITERAL), (('search1', 'search2', 'bar'), rc.LITERAL)
+            ):
+                search_params = rc.Search()
+                expected = []
+                for idx, pattern in enumerate(chain):
+                    search_params.add(pattern, None, flags)
+                    single = rc.Search()
+                    single.add(pattern, None, flags)
+                    fs = rc._FileSearch(single, self.get_file_attr(name), 0, 0, (0, 0), None, None, None)
+                    expected.extend((idx, r.match.match) for r in fs.run())
+
+                fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, (0, 0), None, None, None)
+                results = [(r.match.entry, r.match.match) for r in fs.run()]
+                self.assertEqual(sorted(results), sorted(expected))
+
+            # Literals that can't overlap are found in one scan.
+            self.assertEqual(len(fs.pattern_cache.get_passes(search_params, False, rc.RE_MODE)), 1)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_binary_context(self):
+        """Test binary context and deferring its rendering."""
+
+        search_params = rc.Search()
+        search_params.add('binary', None, 0)
+        name = 'tests/encodings/binary.txt'
+
+        fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, rc.PROCESS_BINARY, (0, 0), None, None, None)
+        result = [r for r in fs.run()][0]
+        self.assertEqual(result.info.encoding, 'BIN')
+        self.assertEqual(result.match.lines, 'This is a \ufffd\ufffd\ufffdbinary test.')
+        self.assertEqual(result.match.match, (13, 19))
+
+        fs = rc._FileSearch(
+            search_params, self.get_file_attr(name), 0, rc.PROCESS_BINARY | rc.DEFER_CONTEXT, (0, 0), None, None, None
+        )
+        deferred = [r for r in fs.run()][0]
+        self.assertTrue(isinstance(deferred.match, rc.DeferredMatchRecord))
+        self.assertEqual(deferred.match[3].content, b'This is a \x00\x00\x00binary test.')
+        self.assertEqual(deferred.match.lines, result.match.lines)
+        self.assertEqual(deferred.match.match, result.match.match)
+
+    def test_deferred_context(self):
+        """Test that deferred context lines share the decoded content and render the same lines."""
+
+        search_params = rc.Search()
+        search_params.add('search', None, 0)
+        name = 'tests/searches/searches_unix_ending.txt'
+
+        fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, (1, 1), None, None, None)
+        results = [r.match for r in fs.run()]
+        fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, rc.DEFER_CONTEXT, (1, 1), None, None, None)
+        deferred = [r.match for r in fs.run()]
+
+        self.assertEqual([r.lines for r in deferred], [r.lines for r in results])
+        # The first matches of a file only hold their own lines.
+        self.assertEqual(deferred[0][3].content, deferred[0].lines)
+        self.assertEqual(pickle.loads(pickle.dumps(deferred[1]))[3].content, results[1].lines)
+
+        # Once the lines of a file's matches add up to its size, the matches share its content.
+        folder = tempfile.mkdtemp()
+        try:
+            name = os.path.join(folder, 'test.txt')
+            with open(name, 'wb') as f:
+                f.write(b'search\n' * 50)
+            fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, rc.DEFER_CONTEXT, (1, 1), None, None, None)
+            deferred = [r.match for r in fs.run()]
+            self.assertEqual(deferred[0][3].content, 'search\nsearch')
+            self.assertEqual(len(deferred[-1][3].content), 350)
+            self.assertTrue(deferred[-1][3].content is deferred[-2][3].content)
+            fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, (1, 1), None, None, None)
+            self.assertEqual([r.lines for r in deferred], [r.match.lines for r in fs.run()])
+        finally:
+            shutil.rmtree(folder)
+
+    def test_stream_search(self):
+        """Test that searching a file in a stream finds the same results as searching it whole."""
+
+        for name in ('tests/searches/searches_unix_ending.txt', 'tests/encodings/utf16_be_bom.txt'):
+            for pattern, flags, context in (('search', 0, (1, 1)), ('^$', rc.MULTILINE, (2, 0)), (r'\w+', 0, (0, 0))):
+                search_params = rc.Search()
+                search_params.add(pattern, None, flags)
+                fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, context, None, None, None)
+                results = [r for r in fs.run()]
+
+                with mock.patch.object(rc.text_decode, 'MAX_GUESS_SIZE', 1):
+                    with mock.patch.object(rc, 'STREAM_CHUNK_SIZE', 3):
+                        fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, context, None, None, None)
+                        with mock.patch.object(fs, '_search_content') as mock_search:
+                            self.assertEqual([r for r in fs.run()], results)
+                            self.assertEqual(mock_search.call_count, 0)
+
+    def test_stream_line_endings(self):
+        """Test that the line ending of a streamed file is known before a chunk ending in `\\r` is matched."""
+
+        search_params = rc.Search()
+        search_params.add('ab', None, 0)
+
+        folder = tempfile.mkdtemp()
+        try:
+            for ending in ('\r', '\r\n'):
+                name = os.path.join(folder, 'test.txt')
+                with open(name, 'wb') as f:
+                    f.write(('ab    ' + ending + 'ab' + ending).encode('ascii'))
+
+                fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, (0, 0), None, None, None)
+                results = [r for r in fs.run()]
+
+                with mock.patch.object(rc.text_decode, 'MAX_GUESS_SIZE', 1):
+                    with mock.patch.object(rc, 'STREAM_CHUNK_SIZE', 7):
+                        fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, (0, 0), None, None, None)
+                        self.assertEqual([r for r in fs.run()], results)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_stream_lookaround(self):
+        """Test that look arounds in a streamed file see text across chunks."""
+
+        folder = tempfile.mkdtemp()
+        try:
+            name = os.path.join(folder, 'test.txt')
+            with open(name, 'wb') as f:
+                f.write(b'xxa bcdefgh yy zz\n')
+
+            for pattern in ('a(?= bcdefg)', '(?<=xxa bcd)ef', r'\byy\b'):
+                search_params = rc.Search()
+                search_params.add(pattern, None, 0)
+
+                fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, (0, 0), None, None, None)
+                results = [r for r in fs.run()]
+                self.assertEqual(len(results), 1)
+
+                with mock.patch.object(rc.text_decode, 'MAX_GUESS_SIZE', 1):
+                    for size in range(2, 10):
+                        with mock.patch.object(rc, 'STREAM_CHUNK_SIZE', size):
+                            fs = rc._FileSearch(
+                                search_params, self.get_file_attr(name), 0, 0, (0, 0), None, None, None
+                            )
+                            self.assertEqual([r for r in fs.run()], results)
+        finally:
+            shutil.rmtree(folder)
+
     def test_literal_search(self):
         """Test for literal search."""
 
@@ -948,6 +1375,164 @@ class TestFileSearch(unittest.TestCase):
             if f is not None:
                 os.remove(f.name)
 
+    def test_fused_chain_replace(self):
+        """Test that literals replaced in one step give the same result as replacing them in turn."""
+
+        search_params = rc.Search(True)
+        search_params.add('search1', 'ABC', rc.LITERAL)
+        search_params.add('search2', 'r', rc.LITERAL)
+        search_params.add('r', 'x', rc.LITERAL)
+
+        folder = tempfile.mkdtemp()
+        try:
+            name = os.path.join(folder, 'test.txt')
+            with open(name, 'wb') as f:
+                f.write(codecs.BOM_UTF8 + 'search2 search1 Ā search2'.encode('utf-8'))
+
+            fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, 0, (0, 0), None, 'rum-bak', None)
+            results = [r for r in fs.run()]
+            self.assertTrue(all(r.error is None for r in results))
+            self.assertEqual(
+                [(r.match.match, r.match.entry) for r in results],
+                [((0, 7), 1), ((8, 15), 0), ((14, 21), 1), ((0, 1), 2), ((8, 9), 2)]
+            )
+
+            with open(name, 'rb') as f:
+                self.assertEqual(f.read(), codecs.BOM_UTF8 + 'x ABC Ā x'.encode('utf-8'))
+            self.assertEqual(os.listdir(folder), ['test.txt'])
+        finally:
+            shutil.rmtree(folder)
+
+    def test_linked_replace(self):
+        """Test that replacing a symlinked or hard linked file updates every link to it."""
+
+        search_params = rc.Search(True)
+        search_params.add('foo', 'baz', rc.LITERAL)
+
+        folder = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(folder, 'real'))
+            os.mkdir(os.path.join(folder, 'search'))
+            target = os.path.join(folder, 'real', 'target.txt')
+            other = os.path.join(folder, 'real', 'other.txt')
+            with open(target, 'wb') as f:
+                f.write(b'foo bar')
+
+            if hasattr(os, 'symlink'):
+                link = os.path.join(folder, 'search', 'link.txt')
+                os.symlink(os.path.join('..', 'real', 'target.txt'), link)
+                fs = rc._FileSearch(search_params, self.get_file_attr(link), 0, 0, (0, 0), None, 'rum-bak', None)
+                self.assertTrue(all(r.error is None for r in fs.run()))
+                self.assertTrue(os.path.islink(link))
+                with open(target, 'rb') as f:
+                    self.assertEqual(f.read(), b'baz bar')
+                self.assertEqual(os.listdir(os.path.join(folder, 'real')), ['target.txt'])
+
+            search_params = rc.Search(True)
+            search_params.add('bar', 'qux', rc.LITERAL)
+            os.link(target, other)
+            fs = rc._FileSearch(search_params, self.get_file_attr(target), 0, 0, (0, 0), None, 'rum-bak', None)
+            self.assertTrue(all(r.error is None for r in fs.run()))
+            with open(other, 'rb') as f:
+                self.assertEqual(f.read(), b'baz qux')
+            self.assertEqual(os.stat(other).st_ino, os.stat(target).st_ino)
+
+            # A file whose owner can't be kept is rewritten in place too.
+            os.remove(other)
+            inode = os.stat(target).st_ino
+            search_params = rc.Search(True)
+            search_params.add('qux', 'bar', rc.LITERAL)
+            with mock.patch('rummage.lib.rumcore.os.chown', side_effect=OSError, create=True):
+                fs = rc._FileSearch(search_params, self.get_file_attr(target), 0, 0, (0, 0), None, 'rum-bak', None)
+                self.assertTrue(all(r.error is None for r in fs.run()))
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), b'baz bar')
+            self.assertEqual(os.stat(target).st_ino, inode)
+            self.assertEqual(os.listdir(os.path.join(folder, 'real')), ['target.txt'])
+
+            # A failed rewrite in place is not atomic, so the new content is kept for the error to point to.
+            os.link(target, other)
+            search_params = rc.Search(True)
+            search_params.add('bar', 'qux', rc.LITERAL)
+            batch = rc._ReplaceBatch()
+            with mock.patch('rummage.lib.rumcore.shutil.copyfileobj', side_effect=IOError):
+                fs = rc._FileSearch(
+                    search_params, self.get_file_attr(target), 0, 0, (0, 0), None, 'rum-bak', None,
+                    replace_batch=batch
+                )
+                self.assertTrue(all(r.error is None for r in fs.run()))
+                batch.flush()
+            self.assertEqual([name for name, error in batch.errors], [os.path.realpath(target)])
+            kept = [n for n in os.listdir(os.path.join(folder, 'real')) if n.startswith(rc.TEMP_PREFIX)]
+            self.assertEqual(len(kept), 1)
+            self.assertIn(kept[0], batch.errors[0][1][0])
+            with open(os.path.join(folder, 'real', kept[0]), 'rb') as f:
+                self.assertEqual(f.read(), b'baz qux')
+        finally:
+            shutil.rmtree(folder)
+
+    def test_backup(self):
+        """Test backing up replaced files by linking, cloning, or copying them."""
+
+        search_params = rc.Search(True)
+        search_params.add('search', 'replace', rc.LITERAL)
+
+        folder = tempfile.mkdtemp()
+        try:
+            name = os.path.join(folder, 'test.txt')
+            for fail in (False, True):
+                with open(name, 'wb') as f:
+                    f.write(b'search')
+                inode = os.stat(name).st_ino
+
+                with mock.patch('rummage.lib.rumcore.os.link', side_effect=OSError if fail else os.link):
+                    with mock.patch('rummage.lib.rumcore._clone_file', side_effect=OSError) as mock_clone:
+                        fs = rc._FileSearch(
+                            search_params, self.get_file_attr(name), 0, rc.BACKUP, (0, 0), None, 'rum-bak', None
+                        )
+                        self.assertTrue(all(r.error is None for r in fs.run()))
+                self.assertEqual(mock_clone.call_count, 1 if fail else 0)
+
+                with open(name, 'rb') as f:
+                    self.assertEqual(f.read(), b'replace')
+                with open(name + '.rum-bak', 'rb') as f:
+                    self.assertEqual(f.read(), b'search')
+                if fail:
+                    self.assertNotEqual(os.stat(name + '.rum-bak').st_ino, inode)
+                else:
+                    self.assertEqual(os.stat(name + '.rum-bak').st_ino, inode)
+
+            # A file rewritten in place, as it has other hard links, is not backed up by a hard link.
+            with open(name, 'wb') as f:
+                f.write(b'search')
+            os.link(name, os.path.join(folder, 'other.txt'))
+            fs = rc._FileSearch(search_params, self.get_file_attr(name), 0, rc.BACKUP, (0, 0), None, 'rum-bak', None)
+            self.assertTrue(all(r.error is None for r in fs.run()))
+            with open(name + '.rum-bak', 'rb') as f:
+                self.assertEqual(f.read(), b'search')
+            self.assertNotEqual(os.stat(name + '.rum-bak').st_ino, os.stat(name).st_ino)
+
+            # A symlinked file's target is backed up, not the symlink.
+            if hasattr(os, 'symlink'):
+                os.mkdir(os.path.join(folder, 'search'))
+                link = os.path.join(folder, 'search', 'link.txt')
+                with open(name, 'wb') as f:
+                    f.write(b'search')
+                os.symlink(os.path.join('..', 'test.txt'), link)
+                fs = rc._FileSearch(
+                    search_params, self.get_file_attr(link), 0, rc.BACKUP | rc.BACKUP_FOLDER, (0, 0), None,
+                    '.rum-bak', None
+                )
+                self.assertTrue(all(r.error is None for r in fs.run()))
+                backup = os.path.join(folder, 'search', '.rum-bak', 'link.txt.bak')
+                self.assertFalse(os.path.islink(backup))
+                with open(backup, 'rb') as f:
+                    self.assertEqual(f.read(), b'search')
+                with open(name, 'rb') as f:
+                    self.assertEqual(f.read(), b'replace')
+        finally:
+            shutil.rmtree(folder)
+
     def test_literal_binary_search(self):
         """Test for literal search."""
 
@@ -1072,3 +1657,223 @@ class TestFileSearch(unittest.TestCase):
         finally:
             if f is not None:
                 os.remove(f.name)
+
+    def test_parallel_abort(self):
+        """Test that a worker process leaves files queued before a replace was aborted untouched."""
+
+        search_params = rc.Search(True)
+        search_params.add('search', 'replace', rc.LITERAL)
+
+        folder = tempfile.mkdtemp()
+        try:
+            name = os.path.join(folder, 'test.txt')
+            with open(name, 'wb') as f:
+                f.write(b'search')
+
+            abort = threading.Event()
+            rc._parallel_init(search_params, rc.BACKUP, (0, 0), None, 'rum-bak', rc.RE_MODE, None, abort)
+            try:
+                file_id, records, replaced, encodings = rc._parallel_search((self.get_file_attr(name), 0, None))
+                self.assertEqual(len(replaced), 1)
+
+                with open(name, 'wb') as f:
+                    f.write(b'search')
+                abort.set()
+                self.assertEqual(rc._parallel_search((self.get_file_attr(name), 1, None)), (1, [], [], []))
+            finally:
+                rc._WORKER.clear()
+
+            with open(name, 'rb') as f:
+                self.assertEqual(f.read(), b'search')
+        finally:
+            shutil.rmtree(folder)
+
+
+class TestRummage(unittest.TestCase):
+    """Test the Rummage object."""
+
+    def get_results(self, **kwargs):
+        """Search the test folders and return the results."""
+
+        search_params = rc.Search()
+        search_params.add('search', None, rc.IGNORECASE | rc.LITERAL)
+
+        rummage = rc.Rummage(
+            'tests', search_params, '*.txt|*.py', None, rc.RECURSIVE | rc.MULTILINE, context=(1, 1), **kwargs
+        )
+        results = [r for r in rummage.find()]
+        return results, rummage.get_status()
+
+    def test_parallel(self):
+        """Test searching files with worker processes."""
+
+        results, status = self.get_results()
+        results2, status2 = self.get_results(workers=2, ordered=True)
+
+        self.assertEqual(status, status2)
+        self.assertEqual(
+            [(r.info.name, r.match) for r in results if hasattr(r, 'match')],
+            [(r.info.name, r.match) for r in results2 if hasattr(r, 'match')]
+        )
+
+    def test_replace(self):
+        """Test that replaced files are renamed over their originals in batches."""
+
+        search_params = rc.Search(True)
+        search_params.add('search', 'replace', rc.LITERAL)
+
+        folder = tempfile.mkdtemp()
+        try:
+            for sub in ('a', 'b'):
+                os.mkdir(os.path.join(folder, sub))
+                for x in range(3):
+                    with open(os.path.join(folder, sub, '%d.txt' % x), 'wb') as f:
+                        f.write(b'search\nkeep\n')
+            os.chmod(os.path.join(folder, 'a', '0.txt'), 0o600)
+
+            with mock.patch('rummage.lib.rumcore._ReplaceBatch', return_value=rc._ReplaceBatch(2)):
+                with mock.patch('rummage.lib.rumcore._sync_folder') as mock_sync:
+                    rummage = rc.Rummage(folder, search_params, '*.txt', None, rc.RECURSIVE)
+                    results = [r for r in rummage.find()]
+            self.assertEqual(len([r for r in results if r.error is None and r.match is not None]), 6)
+            # Each folder is synced once per batch of two files.
+            self.assertEqual(mock_sync.call_count, 4)
+            with open(os.path.join(folder, 'b', '2.txt'), 'rb') as f:
+                self.assertEqual(f.read(), b'replace\nkeep\n')
+
+            search_params = rc.Search(True)
+            search_params.add('replace', 'search', rc.LITERAL)
+            rummage = rc.Rummage(folder, search_params, '*.txt', None, rc.RECURSIVE, workers=2)
+            results = [r for r in rummage.find()]
+            self.assertEqual(len([r for r in results if r.error is None and r.match is not None]), 6)
+
+            for sub in ('a', 'b'):
+                self.assertEqual(sorted(os.listdir(os.path.join(folder, sub))), ['0.txt', '1.txt', '2.txt'])
+                for x in range(3):
+                    with open(os.path.join(folder, sub, '%d.txt' % x), 'rb') as f:
+                        self.assertEqual(f.read(), b'search\nkeep\n')
+            if util.platform() != "windows":
+                self.assertEqual(os.stat(os.path.join(folder, 'a', '0.txt')).st_mode & 0o777, 0o600)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_abort_parallel_replace(self):
+        """Test that aborting a parallel replace lets the workers finish the files they replace."""
+
+        search_params = rc.Search(True)
+        search_params.add('search', 'replace', rc.LITERAL)
+
+        folder = tempfile.mkdtemp()
+        try:
+            for x in range(20):
+                with open(os.path.join(folder, '%d.txt' % x), 'wb') as f:
+                    f.write(b'search\n')
+
+            terminate = multiprocessing.pool.Pool.terminate
+            with mock.patch.object(
+                multiprocessing.pool.Pool, 'terminate', autospec=True, side_effect=terminate
+            ) as mock_terminate:
+                rummage = rc.Rummage(folder, search_params, '*.txt', None, rc.BACKUP, workers=2)
+                for r in rummage.find():
+                    rummage.kill()
+                self.assertEqual(mock_terminate.call_count, 0)
+
+            names = os.listdir(folder)
+            self.assertFalse([n for n in names if n.startswith(rc.TEMP_PREFIX)])
+            for x in range(20):
+                with open(os.path.join(folder, '%d.txt' % x), 'rb') as f:
+                    replaced = f.read() == b'replace\n'
+                self.assertEqual('%d.txt.rum-bak' % x in names, replaced)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_parallel_error(self):
+        """Test that a file a worker process fails on is reported and the search still finishes."""
+
+        if not util.PY3:
+            return
+
+        search_params = rc.Search()
+        search_params.add('search', None, rc.LITERAL)
+
+        with mock.patch.object(rc, '_parallel_search', _fail_search):
+            rummage = rc.Rummage('tests/searches', search_params, '*.txt', workers=2)
+            results = [r for r in rummage.find()]
+        errors = [r for r in results if isinstance(r, rc.ErrorRecord)]
+        self.assertTrue(errors)
+        self.assertIn('RuntimeError', errors[0].error[0])
+
+    def test_compact(self):
+        """Test that compact records expand to the records a search returns."""
+
+        results = self.get_results()[0]
+
+        search_params = rc.Search()
+        search_params.add('search', None, rc.IGNORECASE | rc.LITERAL)
+        rummage = rc.Rummage(
+            'tests', search_params, '*.txt|*.py', None, rc.RECURSIVE | rc.MULTILINE, context=(1, 1)
+        )
+        compact = [r for r in rummage.find_compact()]
+        groups = [r for r in compact if isinstance(r, rc.FileMatchesRecord)]
+
+        self.assertTrue(groups)
+        self.assertEqual(sum(len(g) for g in groups), len([r for r in results if getattr(r, 'match', None)]))
+        self.assertEqual(list(rc.expand_records(compact)), results)
+        self.assertEqual(list(rc.expand_records(pickle.loads(pickle.dumps(compact)))), results)
+
+    def test_batches(self):
+        """Test that batches hold the records a search returns along with its status."""
+
+        results, status = self.get_results()
+
+        search_params = rc.Search()
+        search_params.add('search', None, rc.IGNORECASE | rc.LITERAL)
+        rummage = rc.Rummage(
+            'tests', search_params, '*.txt|*.py', None, rc.RECURSIVE | rc.MULTILINE, context=(1, 1)
+        )
+        batches = [b for b in rummage.find_batches(max_items=3, max_latency_ms=10000)]
+
+        self.assertTrue(all(len(batch) <= 3 for batch, s in batches))
+        self.assertEqual([r for batch, s in batches for r in batch], results)
+        self.assertEqual(batches[-1][1], status)
+
+    def test_abandoned_batches(self):
+        """Test that the search stops when the batches are abandoned."""
+
+        search_params = rc.Search()
+        search_params.add('search', None, rc.IGNORECASE | rc.LITERAL)
+
+        rummage = rc.Rummage('tests', search_params, '*', None, rc.RECURSIVE)
+        batches = rummage.find_batches(max_items=1)
+        next(batches)
+        batches.close()
+        self.assertTrue(rummage.abort)
+        self.assertIsNone(rummage.crawler)
+
+    def test_parallel_max_count(self):
+        """Test that worker processes respect the max count."""
+
+        results = self.get_results(workers=2, max_count=2)[0]
+        self.assertEqual(len([r for r in results if getattr(r, 'match', None) is not None]), 2)
+
+    def test_crawl_queue_size(self):
+        """Test that the crawler blocks on a full queue without losing files."""
+
+        results, status = self.get_results()
+        results2, status2 = self.get_results(queue_size=1)
+
+        self.assertEqual(status, status2)
+        self.assertEqual(sorted(repr(r) for r in results), sorted(repr(r) for r in results2))
+
+    def test_abandoned_search(self):
+        """Test that the crawler stops when the search is abandoned."""
+
+        search_params = rc.Search()
+        search_params.add('search', None, rc.IGNORECASE | rc.LITERAL)
+
+        rummage = rc.Rummage('tests', search_params, '*', None, rc.RECURSIVE, queue_size=1)
+        results = rummage.find()
+        next(results)
+        results.close()
+        self.assertTrue(rummage.abort)
+        self.assertIsNone(rummage.crawler)
@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 import unittest
 import mock
 import codecs
+import mmap
 from rummage.lib.rumcore import text_decode
 
 
@@ -186,6 +187,17 @@ class TestSizeGuess(unittest.TestCase):
         self.assertEqual(encoding.encode, 'bin')
         self.assertEqual(encoding.bom, None)
 
+    @mock.patch('rummage.lib.rumcore.text_decode._is_very_large')
+    def test_too_big_sampled(self, mock_size):
+        """Test guessing a file size 30MB or greater from a sample of it."""
+
+        mock_size.return_value = True
+        with open('tests/encodings/utf8.txt', 'rb') as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.assertEqual(text_decode.mguess(m, f.name).encode, 'bin')
+            self.assertEqual(text_decode.mguess(m, f.name, sample_large=True).encode, 'utf-8')
+            m.close()
+
     def test_too_small_ascii(self):
         """Test a small ascii file."""
 